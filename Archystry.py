@@ -1,98 +1,130 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.patches import FancyBboxPatch
+from matplotlib.backends.backend_pdf import PdfPages
+import matplotlib.image as mpimg
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
+import atexit
+import base64
+import csv
+import hashlib
+import html
+import importlib
+import io
+import itertools
 import json
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
 import uuid
 from typing import Dict, List, Any
 
-# Page config
-st.set_page_config(
-    page_title="Security Architecture Canvas",
-    page_icon="🛡️",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+# Default risk and mitigation libraries. Entries are replaced, never edited in
+# place, so sessions and the API can start from shallow copies.
+DEFAULT_RISKS = {
+    'ADV001': {
+        'description': 'Adversary compromises customer credentials',
+        'impact': 'High',
+        'domain': 'Services',
+        'likelihood': 'Medium'
+    },
+    'ADV002': {
+        'description': 'Data breach through application vulnerability',
+        'impact': 'Critical',
+        'domain': 'Applications',
+        'likelihood': 'High'
+    },
+    'ADV003': {
+        'description': 'Network intrusion attempt',
+        'impact': 'Medium',
+        'domain': 'Network',
+        'likelihood': 'Medium'
+    },
+    'ADV004': {
+        'description': 'Unauthorized access to sensitive data',
+        'impact': 'High',
+        'domain': 'Information',
+        'likelihood': 'Medium'
+    },
+    'ADV005': {
+        'description': 'Social engineering attacks on personnel',
+        'impact': 'High',
+        'domain': 'People',
+        'likelihood': 'High'
+    }
+}
+
+DEFAULT_MITIGATIONS = {
+    'MIT001': {
+        'description': 'Multi-factor authentication implementation',
+        'domain': 'Services',
+        'mapped_risks': ['ADV001'],
+        'effectiveness': 'High',
+        'cost': 'Medium'
+    },
+    'MIT002': {
+        'description': 'Security code review and testing',
+        'domain': 'Applications',
+        'mapped_risks': ['ADV002'],
+        'effectiveness': 'High',
+        'cost': 'Medium'
+    },
+    'MIT003': {
+        'description': 'Network segmentation and monitoring',
+        'domain': 'Network',
+        'mapped_risks': ['ADV003'],
+        'effectiveness': 'Medium',
+        'cost': 'High'
+    },
+    'MIT004': {
+        'description': 'Data encryption and access controls',
+        'domain': 'Information',
+        'mapped_risks': ['ADV004'],
+        'effectiveness': 'High',
+        'cost': 'Medium'
+    },
+    'MIT005': {
+        'description': 'Security awareness training',
+        'domain': 'People',
+        'mapped_risks': ['ADV005'],
+        'effectiveness': 'Medium',
+        'cost': 'Low'
+    }
+}
 
 # Initialize session state
 def initialize_session_state():
-    if 'projects' not in st.session_state:
-        st.session_state.projects = {}
-    
-    if 'risks' not in st.session_state:
-        st.session_state.risks = {
-            'ADV001': {
-                'description': 'Adversary compromises customer credentials',
-                'impact': 'High',
-                'domain': 'Services',
-                'likelihood': 'Medium'
-            },
-            'ADV002': {
-                'description': 'Data breach through application vulnerability',
-                'impact': 'Critical',
-                'domain': 'Applications',
-                'likelihood': 'High'
-            },
-            'ADV003': {
-                'description': 'Network intrusion attempt',
-                'impact': 'Medium',
-                'domain': 'Network',
-                'likelihood': 'Medium'
-            },
-            'ADV004': {
-                'description': 'Unauthorized access to sensitive data',
-                'impact': 'High',
-                'domain': 'Information',
-                'likelihood': 'Medium'
-            },
-            'ADV005': {
-                'description': 'Social engineering attacks on personnel',
-                'impact': 'High',
-                'domain': 'People',
-                'likelihood': 'High'
-            }
-        }
-    
-    if 'mitigations' not in st.session_state:
-        st.session_state.mitigations = {
-            'MIT001': {
-                'description': 'Multi-factor authentication implementation',
-                'domain': 'Services',
-                'mapped_risks': ['ADV001'],
-                'effectiveness': 'High',
-                'cost': 'Medium'
-            },
-            'MIT002': {
-                'description': 'Security code review and testing',
-                'domain': 'Applications',
-                'mapped_risks': ['ADV002'],
-                'effectiveness': 'High',
-                'cost': 'Medium'
-            },
-            'MIT003': {
-                'description': 'Network segmentation and monitoring',
-                'domain': 'Network',
-                'mapped_risks': ['ADV003'],
-                'effectiveness': 'Medium',
-                'cost': 'High'
-            },
-            'MIT004': {
-                'description': 'Data encryption and access controls',
-                'domain': 'Information',
-                'mapped_risks': ['ADV004'],
-                'effectiveness': 'High',
-                'cost': 'Medium'
-            },
-            'MIT005': {
-                'description': 'Security awareness training',
-                'domain': 'People',
-                'mapped_risks': ['ADV005'],
-                'effectiveness': 'Medium',
-                'cost': 'Low'
-            }
-        }
+    # Projects, libraries and templates live in the process-wide store shared with
+    # the HTTP API. Its dicts are copy-on-write, so each rerun sees one consistent version.
+    store = get_canvas_store()
+    st.session_state.projects = store.projects
+    st.session_state.risks = store.risks
+    st.session_state.mitigations = store.mitigations
+    st.session_state.project_templates = store.templates
     
     if 'current_project' not in st.session_state:
         st.session_state.current_project = None
+    
+    if 'element_layouts' not in st.session_state:
+        st.session_state.element_layouts = {}
+    
+    if 'report_jobs' not in st.session_state:
+        st.session_state.report_jobs = []
+    
+    if 'prepared_exports' not in st.session_state:
+        st.session_state.prepared_exports = {}
+
+# Architecture domains, in display order
+DOMAINS = ["People", "Services", "Applications", "Network", "Data", "Information", "Products", "Process", "Facilities", "Platforms"]
 
 # Domain positions for visual canvas
 DOMAIN_POSITIONS = {
@@ -109,6 +141,290 @@ DOMAIN_POSITIONS = {
     'Data': {'x': 0.8, 'y': 0.2, 'color': '#388E3C'}
 }
 
+# Element-level canvas layout settings
+ELEMENT_LAYOUT_MAX_NODES = 150   # Domains above this are collapsed (level of detail)
+ELEMENT_LAYOUT_ITERATIONS = 60
+ELEMENT_LAYOUT_LABEL_LIMIT = 25  # Only label nodes in sparsely populated domains
+GOLDEN_ANGLE = np.pi * (3 - np.sqrt(5))
+
+# Background report generation settings
+REPORT_FORMATS = ["HTML", "PDF"]
+REPORT_WORKERS = 4
+REPORT_CACHE_BYTES = {'sections': 256 * 1024 * 1024, 'artefacts': 128 * 1024 * 1024}
+REPORT_JOB_HISTORY = 20
+REPORT_POLL_SECONDS = 2
+REPORT_LINES_PER_PAGE = 55
+
+# Threat suggestion rule base. '*' matches any domain or interaction type. Rules
+# suggest library risks by ID and/or by keywords in the risk description; rules
+# with element_keywords only fire when a source or target element mentions one.
+THREAT_RULES = [
+    {'source': 'People', 'target': '*', 'type': '*', 'risks': ['ADV005'], 'weight': 2},
+    {'source': 'People', 'target': 'Services', 'type': '<<uses>>', 'risks': ['ADV001'], 'weight': 3},
+    {'source': '*', 'target': 'Services', 'type': '*', 'risks': ['ADV001'], 'weight': 2,
+     'element_keywords': ['login', 'portal', 'account', 'customer', 'auth', 'sso']},
+    {'source': '*', 'target': 'Applications', 'type': '*', 'risks': ['ADV002'], 'weight': 2},
+    {'source': '*', 'target': 'Network', 'type': '*', 'risks': ['ADV003'], 'weight': 2},
+    {'source': '*', 'target': '*', 'type': '<<connects>>', 'risk_keywords': ['network', 'intrusion'], 'weight': 3},
+    {'source': '*', 'target': 'Information', 'type': '*', 'risks': ['ADV004'], 'weight': 2},
+    {'source': '*', 'target': 'Data', 'type': '*', 'risk_keywords': ['data', 'breach', 'sensitive'], 'weight': 2},
+    {'source': '*', 'target': '*', 'type': '*', 'risk_keywords': ['data', 'sensitive'], 'weight': 2,
+     'element_keywords': ['database', 'db', 'storage', 'pii', 'records', 'warehouse']},
+    {'source': '*', 'target': '*', 'type': '<<manages>>', 'risk_keywords': ['credentials', 'unauthorized'], 'weight': 2,
+     'element_keywords': ['admin', 'administrator', 'operator', 'root']},
+    {'source': '*', 'target': '*', 'type': '<<monitors>>', 'risk_keywords': ['intrusion'], 'weight': 1}
+]
+THREAT_SUGGESTION_LIMIT = 5
+
+# Project snapshot settings
+PROJECT_SNAPSHOT_LIMIT = 50
+RISK_LEVEL_WEIGHTS = {'Low': 1, 'Medium': 2, 'High': 3, 'Critical': 4}
+
+# Project templates. Template and project domain data is stored as tuples and
+# only ever replaced, never edited in place, so clones can share it safely.
+def build_project_template(elements=None, risks=None, mitigations=None, connections=()):
+    """Build frozen domain data for a project template"""
+    
+    template = {'canvas_connections': tuple(connections)}
+    for domain in DOMAINS:
+        template[f'{domain}_elements'] = tuple((elements or {}).get(domain, ()))
+        template[f'{domain}_risks'] = tuple((risks or {}).get(domain, ()))
+        template[f'{domain}_mitigations'] = tuple((mitigations or {}).get(domain, ()))
+    return template
+
+PROJECT_TEMPLATES = {
+    'Blank Architecture': build_project_template(
+        elements={'People': ['Customer', 'User', 'Admin']}
+    ),
+    'Three-Tier Web Application': build_project_template(
+        elements={
+            'People': ['Customer', 'User', 'Admin'],
+            'Services': ['Customer Portal', 'Identity Provider'],
+            'Applications': ['Web Frontend', 'Order API', 'Admin Console'],
+            'Platforms': ['Kubernetes Cluster', 'Load Balancer'],
+            'Network': ['DMZ', 'Internal VLAN', 'Web Application Firewall'],
+            'Data': ['Orders DB', 'Customer Records'],
+            'Information': ['PII', 'Payment Data'],
+            'Process': ['Incident Response']
+        },
+        risks={'People': ['ADV005'], 'Services': ['ADV001'], 'Applications': ['ADV002'],
+               'Network': ['ADV003'], 'Data': ['ADV004']},
+        mitigations={'People': ['MIT005'], 'Services': ['MIT001'], 'Applications': ['MIT002'],
+                     'Network': ['MIT003'], 'Data': ['MIT004']},
+        connections=[
+            {'id': 'People-Services-0', 'source': 'People', 'target': 'Services', 'type': '<<uses>>',
+             'risk': 'ADV001', 'mitigation': 'MIT001'},
+            {'id': 'Services-Applications-1', 'source': 'Services', 'target': 'Applications', 'type': '<<serves>>',
+             'risk': None, 'mitigation': None},
+            {'id': 'Applications-Data-2', 'source': 'Applications', 'target': 'Data', 'type': '<<uses>>',
+             'risk': 'ADV004', 'mitigation': 'MIT004'},
+            {'id': 'Network-Applications-3', 'source': 'Network', 'target': 'Applications', 'type': '<<secures>>',
+             'risk': 'ADV003', 'mitigation': 'MIT003'}
+        ]
+    )
+}
+
+# Historical metrics settings. Every metric is a per-project gauge; portfolio
+# values are sums, so 'Projects' (always 1) turns sums into counts and averages.
+METRIC_COLUMNS = (['Projects', 'Open', 'In Progress', 'Closed', 'Completion %', 'Risk Exposure',
+                   'Elements', 'Connections', 'Risks', 'Mitigations'] +
+                  [f'{domain} Elements' for domain in DOMAINS] +
+                  [f'{domain} Risks' for domain in DOMAINS])
+METRICS_DAILY_RETENTION = 90  # Older per-project points are downsampled to one per week
+METRICS_PORTFOLIO_DAILY_RETENTION = 400  # Older portfolio days only remain in the weekly rollup
+METRICS_INITIAL_CAPACITY = 32
+
+# Shared store settings. ARCHYSTRY_DATA persists the store to a JSON file and
+# ARCHYSTRY_API_PORT serves the HTTP API (archystry_api.py) from this process.
+STORE_SAVE_DELAY = 1.0  # Seconds to coalesce changes before persisting the store
+
+# Tabular export settings
+EXPORT_FORMATS = ["CSV", "Parquet", "Excel"]
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_SPOOL_SIZE = 8 * 1024 * 1024  # Larger exports spill to a temporary file
+EXCEL_MAX_ROWS = 1048576  # Rows per worksheet, including the header
+EXPORT_DATASETS = {
+    'Project Overview': [('Project Name', 'str'), ('Status', 'str'), ('Owner', 'str'), ('Elements', 'int'),
+                         ('Connections', 'int'), ('Risks', 'int'), ('Mitigations', 'int'),
+                         ('Completion %', 'int'), ('Created', 'str')],
+    'Domain Assignments': [('Project Name', 'str'), ('Domain', 'str'), ('Type', 'str'), ('Item', 'str'),
+                           ('Description', 'str'), ('Impact', 'str')],
+    'Connections': [('Project Name', 'str'), ('Source', 'str'), ('Type', 'str'), ('Target', 'str'),
+                    ('Risk', 'str'), ('Mitigation', 'str'), ('Created', 'str')],
+    'Risk Library': [('Risk ID', 'str'), ('Description', 'str'), ('Impact', 'str'), ('Likelihood', 'str'),
+                     ('Domain', 'str')],
+    'Mitigation Library': [('Mitigation ID', 'str'), ('Description', 'str'), ('Domain', 'str'),
+                           ('Mapped Risks', 'str'), ('Effectiveness', 'str'), ('Cost', 'str')]
+}
+
+class CanvasStore:
+    """Projects, libraries and saved templates shared by every session and the HTTP API
+    
+    The projects and library dicts are copy-on-write: adding or removing an
+    entry rebinds the dict, so a reader iterating a dict it fetched earlier never
+    sees it change size. Changes inside an existing project rebind its values,
+    which are tuples, so clones and snapshots stay valid. Writers make every
+    change inside ``edit()``, which holds the lock, records the metrics history
+    of the projects that changed and schedules a save.
+    
+    With a ``path``, the store is loaded from a JSON file and saved back to it
+    by a single writer thread that coalesces bursts of changes. The metrics
+    history is saved beside it as arrays in a ``.metrics.npz`` file.
+    """
+    
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.RLock()
+        self.projects = {}
+        self.risks = dict(DEFAULT_RISKS)
+        self.mitigations = dict(DEFAULT_MITIGATIONS)
+        self.templates = dict(PROJECT_TEMPLATES)
+        self.library_version = 0
+        self.metrics = new_metrics_store()
+        self.metrics_path = f"{os.path.splitext(path)[0]}.metrics.npz" if path else None
+        self._dirty = threading.Event()
+        self._wake = threading.Event()
+        self._save_lock = threading.Lock()
+        self._closing = False
+        
+        if path:
+            if os.path.exists(path):
+                with open(path) as f:
+                    data = json.load(f)
+                self.projects = {name: freeze_project_data(project) for name, project in data.get('projects', {}).items()}
+                self.risks = data.get('risks', self.risks)
+                self.mitigations = data.get('mitigations', self.mitigations)
+                self.templates.update({name: freeze_project_data(template)
+                                       for name, template in data.get('templates', {}).items()})
+            if os.path.exists(self.metrics_path):
+                with np.load(self.metrics_path) as arrays:
+                    # A history recorded with different metric columns cannot be extended
+                    if arrays['daily_base'].shape == (len(METRIC_COLUMNS),):
+                        self.metrics = unpack_metrics_store(arrays)
+            # Give projects changed while no history was kept a starting point
+            self.record_metrics(self.projects)
+            self._writer = threading.Thread(target=self._write_loop, name='canvas-store-writer', daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+    
+    @contextmanager
+    def edit(self, *projects, library=False):
+        """Hold the lock while changing the named projects, then record their metrics and schedule a save
+        
+        Yields the set of changed project names, so a block that only learns
+        which projects it changes as it goes can add them. A library change
+        records every project, since risk exposure depends on the library.
+        """
+        with self.lock:
+            changed = set(projects)
+            yield changed
+            if library:
+                self.library_version += 1
+                changed = self.projects
+            self.record_metrics(changed)
+        self._dirty.set()
+        self._wake.set()
+    
+    def record_metrics(self, names):
+        """Record the metrics history of the named projects; deleted projects leave the totals"""
+        with self.lock:
+            for name in names:
+                if name in self.projects:
+                    record_project_metrics(self.metrics, name,
+                                           project_metric_vector(self.projects[name], self.risks, self.mitigations))
+                else:
+                    remove_project_metrics(self.metrics, name)
+    
+    def put_projects(self, projects):
+        """Add or replace projects"""
+        with self.edit(*projects):
+            self.projects = {**self.projects, **projects}
+    
+    def delete_project(self, name):
+        with self.edit(name):
+            self.projects = {key: value for key, value in self.projects.items() if key != name}
+    
+    def put_library_entries(self, kind, entries):
+        """Add or replace entries of the 'risks' or 'mitigations' library"""
+        with self.edit(library=True):
+            setattr(self, kind, {**getattr(self, kind), **entries})
+    
+    def delete_library_entry(self, kind, entry_id):
+        with self.edit(library=True):
+            setattr(self, kind, {key: value for key, value in getattr(self, kind).items() if key != entry_id})
+    
+    def put_template(self, name, template):
+        """Add or replace a saved project template"""
+        with self.edit():
+            self.templates = {**self.templates, name: template}
+    
+    def snapshot(self):
+        """Consistent copy of the store for readers on other threads"""
+        with self.lock:
+            return {name: dict(project) for name, project in self.projects.items()}, self.risks, self.mitigations
+    
+    def save(self):
+        """Write the store to its file; saves are serialised and each uses its own temporary file"""
+        with self._save_lock:
+            projects, risks, mitigations = self.snapshot()
+            with self.lock:
+                # Built-in templates come from the code, so only saved ones are persisted
+                templates = {name: template for name, template in self.templates.items()
+                             if PROJECT_TEMPLATES.get(name) is not template}
+                metrics = pack_metrics_store(self.metrics)
+            data = {'projects': projects, 'risks': risks, 'mitigations': mitigations, 'templates': templates}
+            replace_file(self.path, lambda f: json.dump(data, f, default=str))
+            replace_file(self.metrics_path, lambda f: np.savez(f, **metrics), 'wb')
+    
+    def flush(self):
+        """Save pending changes now"""
+        if self.path and self._dirty.is_set():
+            self._dirty.clear()
+            self.save()
+    
+    def close(self):
+        """Save pending changes and stop the writer thread"""
+        if self.path and not self._closing:
+            self._closing = True
+            self._wake.set()
+            self._writer.join()
+    
+    def _write_loop(self):
+        while True:
+            self._wake.wait()
+            if not self._closing:
+                time.sleep(STORE_SAVE_DELAY)
+            self._wake.clear()
+            try:
+                self.flush()
+            except (OSError, TypeError, ValueError):
+                logging.getLogger(__name__).exception("Failed to save the canvas store to %s", self.path)
+            if self._closing and not self._dirty.is_set():
+                return
+
+def replace_file(path, write, mode='w'):
+    """Atomically replace a file with what ``write(file)`` writes to a uniquely named temporary file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(mode, dir=directory, prefix=f".{os.path.basename(path)}.",
+                                     suffix='.tmp', delete=False) as f:
+        temp_path = f.name
+        try:
+            write(f)
+        except Exception:
+            f.close()
+            os.unlink(temp_path)
+            raise
+    os.replace(temp_path, path)
+
+@st.cache_resource
+def get_canvas_store():
+    """Process-wide store shared by every session, and by the HTTP API when enabled"""
+    store = CanvasStore(os.environ.get('ARCHYSTRY_DATA'))
+    if os.environ.get('ARCHYSTRY_API_PORT'):
+        from archystry_api import start_api_server
+        start_api_server(store, os.environ.get('ARCHYSTRY_API_HOST', '127.0.0.1'), int(os.environ['ARCHYSTRY_API_PORT']))
+    return store
+
 def render_interactive_visual_canvas(project_data):
     """Render interactive visual canvas"""
     if not project_data:
@@ -118,7 +434,7 @@ def render_interactive_visual_canvas(project_data):
     st.markdown("### 🎨 Interactive Architecture Canvas")
     
     # Canvas controls
-    col1, col2, col3 = st.columns([2, 2, 1])
+    col1, col2, col3, col4 = st.columns([2, 2, 1, 1])
     
     with col1:
         connection_mode = st.checkbox("🔗 Connection Mode", 
@@ -126,17 +442,26 @@ def render_interactive_visual_canvas(project_data):
     
     with col2:
         if 'canvas_connections' not in project_data:
-            project_data['canvas_connections'] = []
+            with get_canvas_store().edit(st.session_state.current_project):
+                project_data['canvas_connections'] = ()
         
         if st.button("🗑️ Clear All Connections"):
-            project_data['canvas_connections'] = []
+            with get_canvas_store().edit(st.session_state.current_project):
+                project_data['canvas_connections'] = ()
             st.rerun()
     
     with col3:
         show_details = st.checkbox("📋 Show Details", value=True)
     
+    with col4:
+        element_view = st.checkbox("🧩 Element View", 
+                                 help="Show individual domain elements instead of domain summaries")
+    
     # Create visual canvas
-    create_visual_canvas_html(project_data, show_details)
+    if element_view:
+        render_element_canvas(project_data, show_details)
+    else:
+        create_visual_canvas_html(project_data, show_details)
     
     # Connection creation interface
     if connection_mode:
@@ -144,7 +469,7 @@ def render_interactive_visual_canvas(project_data):
         
         domains = list(DOMAIN_POSITIONS.keys())
         
-        col1, col2, col3, col4 = st.columns(4)
+        col1, col2, col3 = st.columns(3)
         
         with col1:
             source_domain = st.selectbox("From Domain", domains, key="conn_source")
@@ -155,21 +480,46 @@ def render_interactive_visual_canvas(project_data):
                                        key="conn_target")
         
         with col3:
-            available_risks = [k for k, v in st.session_state.risks.items()]
+            interaction_type = st.selectbox("Interaction Type", [
+                "<<creates>>", "<<manages>>", "<<uses>>", "<<serves>>", 
+                "<<connects>>", "<<secures>>", "<<monitors>>", "<<controls>>"
+            ], key="conn_type")
+        
+        # Rank library entries by the rule base; suggestions are listed first
+        threat_index = get_threat_index()
+        elements = (*project_data.get(f'{source_domain}_elements', ()),
+                    *project_data.get(f'{target_domain}_elements', ()))
+        suggested_risks, suggested_mits = suggest_connection_threats(
+            threat_index, source_domain, target_domain, interaction_type, elements)
+        suggested_risk_ids = [risk_id for risk_id, score in suggested_risks]
+        suggested_mit_ids = [mit_id for mit_id, score in suggested_mits]
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            available_risks = suggested_risk_ids + [k for k in st.session_state.risks if k not in suggested_risk_ids]
             interaction_risk = st.selectbox("Associated Risk", 
                                           ["None"] + available_risks, 
+                                          format_func=lambda x: f"⭐ {x}" if x in suggested_risk_ids else x,
                                           key="conn_risk")
+            
+            # Prefer mitigations that cover the chosen risk
+            if interaction_risk != "None":
+                covering = threat_index['risk_mitigations'].get(interaction_risk, [])
+                suggested_mit_ids = covering + [m for m in suggested_mit_ids if m not in covering]
         
-        with col4:
-            available_mits = [k for k, v in st.session_state.mitigations.items()]
+        with col2:
+            available_mits = suggested_mit_ids + [k for k in st.session_state.mitigations if k not in suggested_mit_ids]
             interaction_mitigation = st.selectbox("Associated Mitigation", 
                                                 ["None"] + available_mits, 
+                                                format_func=lambda x: f"⭐ {x}" if x in suggested_mit_ids else x,
                                                 key="conn_mitigation")
         
-        interaction_type = st.selectbox("Interaction Type", [
-            "<<creates>>", "<<manages>>", "<<uses>>", "<<serves>>", 
-            "<<connects>>", "<<secures>>", "<<monitors>>", "<<controls>>"
-        ], key="conn_type")
+        if suggested_risk_ids:
+            st.caption("💡 Suggested risks: " + ", ".join(
+                f"{risk_id}: {st.session_state.risks[risk_id]['description'][:40]}" for risk_id in suggested_risk_ids))
+        if suggested_mit_ids:
+            st.caption(f"🛡️ Suggested mitigations: {', '.join(suggested_mit_ids)}")
         
         if st.button("➕ Add Connection"):
             connection_id = f"{source_domain}-{target_domain}-{len(project_data['canvas_connections'])}"
@@ -184,7 +534,8 @@ def render_interactive_visual_canvas(project_data):
                 'created': datetime.now().isoformat()
             }
             
-            project_data['canvas_connections'].append(new_connection)
+            with get_canvas_store().edit(st.session_state.current_project):
+                project_data['canvas_connections'] = (*project_data['canvas_connections'], new_connection)
             st.success(f"✅ Connection created: {source_domain} {interaction_type} {target_domain}")
             st.rerun()
     
@@ -207,7 +558,9 @@ def render_interactive_visual_canvas(project_data):
             
             with col3:
                 if st.button("🗑️", key=f"del_conn_{idx}"):
-                    project_data['canvas_connections'].pop(idx)
+                    with get_canvas_store().edit(st.session_state.current_project):
+                        connections = project_data['canvas_connections']
+                        project_data['canvas_connections'] = (*connections[:idx], *connections[idx + 1:])
                     st.rerun()
 
 def create_visual_canvas_html(project_data, show_details=True):
@@ -316,6 +669,292 @@ def render_domain_node(domain_name, color, project_data, connections, show_detai
     
     st.markdown(node_html, unsafe_allow_html=True)
 
+def compute_domain_regions():
+    """Compute the canvas box (x0, y0, x1, y1) each domain's elements are laid out in"""
+    regions = {}
+    for domain, pos in DOMAIN_POSITIONS.items():
+        row_neighbours = [abs(pos['x'] - p['x']) / 2 for d, p in DOMAIN_POSITIONS.items()
+                          if d != domain and p['y'] == pos['y']]
+        half_width = min(row_neighbours + [0.15]) * 0.9
+        half_height = 0.08
+        regions[domain] = (pos['x'] - half_width, pos['y'] - half_height,
+                           pos['x'] + half_width, pos['y'] + half_height)
+    return regions
+
+def collapse_domain_elements(elements, max_nodes=ELEMENT_LAYOUT_MAX_NODES):
+    """Apply level-of-detail collapsing, returning the node labels and the number of hidden elements"""
+    if len(elements) <= max_nodes:
+        return list(elements), 0
+    
+    shown = list(elements[:max_nodes - 1])
+    hidden = len(elements) - len(shown)
+    return shown + [f"+{hidden} more"], hidden
+
+def compute_connection_bias(connections):
+    """Compute, per domain, a unit pull towards the domains it is connected to"""
+    bias = {domain: np.zeros(2) for domain in DOMAIN_POSITIONS}
+    for conn in connections:
+        source, target = conn['source'], conn['target']
+        if source not in DOMAIN_POSITIONS or target not in DOMAIN_POSITIONS:
+            continue
+        direction = np.array([DOMAIN_POSITIONS[target]['x'] - DOMAIN_POSITIONS[source]['x'],
+                              DOMAIN_POSITIONS[target]['y'] - DOMAIN_POSITIONS[source]['y']])
+        bias[source] += direction
+        bias[target] -= direction
+    
+    for domain, vector in bias.items():
+        length = np.linalg.norm(vector)
+        if length > 0:
+            bias[domain] = vector / length
+    return bias
+
+def layout_domain_nodes(labels, bias, previous=None, iterations=ELEMENT_LAYOUT_ITERATIONS):
+    """Force-directed layout of one domain's nodes in normalised [-1, 1] region coordinates
+    
+    Nodes repel each other and are held together by a gravity towards the region
+    centre, offset by the domain's connection bias. Nodes found in ``previous``
+    (label -> position) are warm-started and damped so a small change only moves
+    the new nodes noticeably.
+    """
+    n = len(labels)
+    if n == 0:
+        return np.zeros((0, 2))
+    
+    # Sunflower seed positions give an even, deterministic starting spread
+    idx = np.arange(n)
+    radius = np.sqrt((idx + 0.5) / n) * 0.8
+    theta = idx * GOLDEN_ANGLE
+    pos = np.column_stack((radius * np.cos(theta), radius * np.sin(theta)))
+    mobility = np.ones(n)
+    
+    if previous:
+        for i, label in enumerate(labels):
+            if label in previous:
+                pos[i] = previous[label]
+                mobility[i] = 0.2
+        if mobility.min() < 1:
+            iterations = max(10, iterations // 4)
+    
+    centre = np.asarray(bias) * 0.15
+    spacing = 1.0 / np.sqrt(n)
+    temperature = 0.1
+    
+    for _ in range(iterations):
+        delta = pos[:, None, :] - pos[None, :, :]
+        dist2 = np.einsum('ijk,ijk->ij', delta, delta)
+        np.fill_diagonal(dist2, np.inf)
+        np.maximum(dist2, 1e-6, out=dist2)
+        repulsion = np.einsum('ijk,ij->ik', delta, spacing * spacing / dist2)
+        offset = pos - centre
+        gravity = -offset * np.linalg.norm(offset, axis=1, keepdims=True) / spacing * 0.3
+        force = repulsion + gravity
+        
+        length = np.linalg.norm(force, axis=1, keepdims=True)
+        step = np.minimum(length, temperature) / np.maximum(length, 1e-9)
+        pos += force * step * mobility[:, None]
+        np.clip(pos, -1, 1, out=pos)
+        temperature *= 0.95
+    
+    # Stretch the settled layout to fill the region
+    extent = np.abs(pos - centre).max()
+    if n > 1 and extent > 0:
+        pos = centre + (pos - centre) * ((0.95 - np.abs(centre).max()) / extent)
+    
+    return pos
+
+def compute_element_layout(project_data, cache=None, max_nodes=ELEMENT_LAYOUT_MAX_NODES):
+    """Lay out every domain element of a project inside its domain region
+    
+    ``cache`` maps domain -> (signature, labels, positions) from a previous run
+    and is updated in place. Domains whose labels and connection bias are
+    unchanged are reused as-is; changed domains are re-laid out incrementally.
+    Returns a dict of domain -> {'labels', 'x', 'y', 'hidden'}.
+    """
+    if cache is None:
+        cache = {}
+    
+    regions = compute_domain_regions()
+    bias = compute_connection_bias(project_data.get('canvas_connections', []))
+    layout = {}
+    
+    for domain, (x0, y0, x1, y1) in regions.items():
+        labels, hidden = collapse_domain_elements(project_data.get(f'{domain}_elements', []), max_nodes)
+        signature = (tuple(labels), tuple(np.round(bias[domain], 6)))
+        
+        cached = cache.get(domain)
+        if cached and cached[0] == signature:
+            positions = cached[2]
+        else:
+            previous = dict(zip(cached[1], cached[2])) if cached else None
+            positions = layout_domain_nodes(labels, bias[domain], previous)
+            cache[domain] = (signature, labels, positions)
+        
+        layout[domain] = {
+            'labels': labels,
+            'x': x0 + (positions[:, 0] + 1) / 2 * (x1 - x0),
+            'y': y0 + (positions[:, 1] + 1) / 2 * (y1 - y0),
+            'hidden': hidden
+        }
+    
+    return layout
+
+def render_element_canvas(project_data, show_details=True):
+    """Render the element-level canvas with elements grouped inside their domains"""
+    st.markdown("#### Security Architecture Canvas - Element View")
+    
+    cache = st.session_state.element_layouts.setdefault(project_data['id'], {})
+    layout = compute_element_layout(project_data, cache)
+    st.pyplot(build_element_canvas_figure(project_data, layout, show_details), use_container_width=True)
+    
+    collapsed = [domain for domain, nodes in layout.items() if nodes['hidden']]
+    if collapsed:
+        st.caption(f"ℹ️ Large domains shown at reduced detail: {', '.join(collapsed)}")
+
+def build_element_canvas_figure(project_data, layout, show_details=True):
+    """Draw a computed element layout onto a new Matplotlib figure"""
+    regions = compute_domain_regions()
+    
+    fig = Figure(figsize=(12, 8))
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0.05, 1.0)
+    ax.axis('off')
+    
+    # Domain-level connections between region centres
+    for conn in project_data.get('canvas_connections', []):
+        if conn['source'] not in DOMAIN_POSITIONS or conn['target'] not in DOMAIN_POSITIONS:
+            continue
+        source, target = DOMAIN_POSITIONS[conn['source']], DOMAIN_POSITIONS[conn['target']]
+        colour = '#D32F2F' if conn['risk'] else '#388E3C' if conn['mitigation'] else '#607D8B'
+        ax.annotate('', xy=(target['x'], target['y']), xytext=(source['x'], source['y']),
+                    arrowprops={'arrowstyle': '->', 'color': colour, 'alpha': 0.5, 'lw': 1.5})
+    
+    for domain, (x0, y0, x1, y1) in regions.items():
+        colour = DOMAIN_POSITIONS[domain]['color']
+        nodes = layout[domain]
+        
+        ax.add_patch(FancyBboxPatch((x0, y0), x1 - x0, y1 - y0, boxstyle='round,pad=0.005',
+                                    facecolor=colour, edgecolor=colour, alpha=0.12))
+        title = domain
+        if show_details:
+            total = len(project_data.get(f'{domain}_elements', []))
+            title += f" ({total})"
+        ax.text(x0 + 0.005, y1 - 0.005, title, fontsize=8, fontweight='bold',
+                color=colour, va='top')
+        
+        if not nodes['labels']:
+            continue
+        
+        sizes = np.full(len(nodes['labels']), 18.0)
+        if nodes['hidden']:
+            sizes[-1] = 120.0
+        ax.scatter(nodes['x'], nodes['y'], s=sizes, c=colour, edgecolors='white', linewidths=0.5)
+        
+        if show_details and len(nodes['labels']) <= ELEMENT_LAYOUT_LABEL_LIMIT:
+            for label, x, y in zip(nodes['labels'], nodes['x'], nodes['y']):
+                ax.text(x, y - 0.008, label, fontsize=6, ha='center', va='top')
+        elif nodes['hidden']:
+            ax.text(nodes['x'][-1], nodes['y'][-1] - 0.01, nodes['labels'][-1],
+                    fontsize=7, ha='center', va='top')
+    
+    return fig
+
+def tokenize(text):
+    """Split free text into lowercase word tokens for keyword matching"""
+    return re.findall(r'[a-z0-9]+', text.lower())
+
+def compile_threat_index(rules, risks, mitigations):
+    """Compile the rule base against the libraries into lookup tables
+    
+    Rules are bucketed by (source, target, type) so a suggestion only visits the
+    handful of buckets that can match, and risk keywords are resolved to risk IDs
+    once here rather than on every lookup.
+    """
+    risk_tokens = {}
+    domain_risks = {}
+    for risk_id, risk_info in risks.items():
+        for token in tokenize(risk_info.get('description', '')):
+            risk_tokens.setdefault(token, set()).add(risk_id)
+        if risk_info.get('domain'):
+            domain_risks.setdefault(risk_info['domain'], []).append(risk_id)
+    
+    rule_index = {}
+    for rule in rules:
+        matched = {risk_id for risk_id in rule.get('risks', []) if risk_id in risks}
+        for keyword in rule.get('risk_keywords', []):
+            matched |= risk_tokens.get(keyword, set())
+        if not matched:
+            continue
+        
+        key = (rule.get('source', '*'), rule.get('target', '*'), rule.get('type', '*'))
+        rule_index.setdefault(key, []).append({
+            'element_keywords': frozenset(rule.get('element_keywords', [])),
+            'risks': tuple(sorted(matched)),
+            'weight': rule.get('weight', 1)
+        })
+    
+    risk_mitigations = {}
+    effectiveness = {}
+    for mit_id, mit_info in mitigations.items():
+        for risk_id in mit_info.get('mapped_risks', []):
+            risk_mitigations.setdefault(risk_id, []).append(mit_id)
+        effectiveness[mit_id] = RISK_LEVEL_WEIGHTS.get(mit_info.get('effectiveness'), 0)
+    
+    return {
+        'rules': rule_index,
+        'domain_risks': domain_risks,
+        'risk_mitigations': risk_mitigations,
+        'effectiveness': effectiveness
+    }
+
+def get_threat_index():
+    """Return the compiled threat index, recompiling only when the library version changes"""
+    cached = st.session_state.get('threat_index')
+    version = get_canvas_store().library_version
+    if not cached or cached[0] != version:
+        cached = (version,
+                  compile_threat_index(THREAT_RULES, st.session_state.risks, st.session_state.mitigations))
+        st.session_state.threat_index = cached
+    return cached[1]
+
+def rank_threats(index, keys, domains, elements, limit=THREAT_SUGGESTION_LIMIT):
+    """Score risks from the rule buckets in ``keys`` and rank the mitigations covering them"""
+    tokens = set(tokenize(' '.join(elements)))
+    scores = {}
+    
+    for key in keys:
+        for rule in index['rules'].get(key, ()):
+            if rule['element_keywords'] and not rule['element_keywords'] & tokens:
+                continue
+            for risk_id in rule['risks']:
+                scores[risk_id] = scores.get(risk_id, 0) + rule['weight']
+    
+    # Library risks filed under an involved domain get a small affinity bonus
+    for domain in domains:
+        for risk_id in index['domain_risks'].get(domain, ()):
+            scores[risk_id] = scores.get(risk_id, 0) + 1
+    
+    ranked_risks = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    
+    mit_scores = {}
+    for risk_id, score in ranked_risks:
+        for mit_id in index['risk_mitigations'].get(risk_id, ()):
+            mit_scores[mit_id] = mit_scores.get(mit_id, 0) + score
+    ranked_mits = sorted(mit_scores.items(),
+                         key=lambda item: (-item[1], -index['effectiveness'].get(item[0], 0), item[0]))[:limit]
+    
+    return ranked_risks, ranked_mits
+
+def suggest_connection_threats(index, source, target, interaction_type, elements):
+    """Suggest ranked (risk, score) and (mitigation, score) pairs for a new connection"""
+    keys = set(itertools.product((source, '*'), (target, '*'), (interaction_type, '*')))
+    return rank_threats(index, keys, {source, target}, elements)
+
+def suggest_element_threats(index, domain, elements):
+    """Suggest ranked risks and mitigations for the elements of a domain"""
+    keys = {(domain, '*', '*'), ('*', domain, '*'), ('*', '*', '*')}
+    return rank_threats(index, keys, {domain}, elements)
+
 def dashboard():
     """Dashboard with project overview and statistics"""
     st.header("📊 Architecture Dashboard")
@@ -349,31 +988,13 @@ def dashboard():
     # Project overview table
     st.subheader("📋 Project Overview")
     
-    project_data = []
-    domains = ["People", "Services", "Applications", "Network", "Data", "Information", "Products", "Process", "Facilities", "Platforms"]
-    
-    for project_name, project_info in st.session_state.projects.items():
-        total_elements = sum(len(project_info.get(f'{domain}_elements', [])) for domain in domains)
-        total_risks = sum(len(project_info.get(f'{domain}_risks', [])) for domain in domains)
-        total_mitigations = sum(len(project_info.get(f'{domain}_mitigations', [])) for domain in domains)
-        total_connections = len(project_info.get('canvas_connections', []))
-        completion = calculate_completion_score(project_info)
-        
-        project_data.append({
-            'Project Name': project_name,
-            'Status': project_info['status'],
-            'Owner': project_info['owner'],
-            'Elements': total_elements,
-            'Connections': total_connections,
-            'Risks': total_risks,
-            'Mitigations': total_mitigations,
-            'Completion %': completion,
-            'Created': project_info['created_date'][:10]
-        })
     
-    if project_data:
-        df = pd.DataFrame(project_data)
-        st.dataframe(df, use_container_width=True)
+    columns = [name for name, kind in EXPORT_DATASETS['Project Overview']]
+    df = pd.DataFrame(iter_overview_rows(st.session_state.projects), columns=columns)
+    st.dataframe(df, use_container_width=True)
+    
+    with st.expander("📤 Export Portfolio Data"):
+        render_export_controls(["Project Overview", "Domain Assignments", "Connections"], "dashboard_export")
     
     # Analytics section
     col1, col2 = st.columns(2)
@@ -409,7 +1030,7 @@ def dashboard():
         st.subheader("🏗️ Architecture Complexity")
         
         domain_totals = {}
-        for domain in domains:
+        for domain in DOMAINS:
             total = sum(len(project_info.get(f'{domain}_elements', [])) 
                        for project_info in st.session_state.projects.values())
             if total > 0:
@@ -428,6 +1049,205 @@ def dashboard():
                 st.write(f"• **{domain}:** {count} elements")
         else:
             st.info("No domain elements defined yet")
+    
+    st.markdown("---")
+    render_portfolio_trends()
+
+def iter_overview_rows(projects):
+    """Yield one Project Overview row per project"""
+    
+    for project_name, project_info in projects.items():
+        yield (
+            project_name,
+            project_info['status'],
+            project_info['owner'],
+            sum(len(project_info.get(f'{domain}_elements', [])) for domain in DOMAINS),
+            len(project_info.get('canvas_connections', [])),
+            sum(len(project_info.get(f'{domain}_risks', [])) for domain in DOMAINS),
+            sum(len(project_info.get(f'{domain}_mitigations', [])) for domain in DOMAINS),
+            calculate_completion_score(project_info),
+            project_info['created_date'][:10]
+        )
+
+def iter_assignment_rows(projects, risks, mitigations):
+    """Yield the per-domain elements, risks and mitigations of every project as a long table"""
+    
+    for project_name, project_info in projects.items():
+        for domain in DOMAINS:
+            for element in project_info.get(f'{domain}_elements', []):
+                yield (project_name, domain, 'Element', element, '', '')
+            for risk_id in project_info.get(f'{domain}_risks', []):
+                risk_info = risks.get(risk_id, {})
+                yield (project_name, domain, 'Risk', risk_id,
+                       risk_info.get('description', ''), risk_info.get('impact', ''))
+            for mit_id in project_info.get(f'{domain}_mitigations', []):
+                yield (project_name, domain, 'Mitigation', mit_id,
+                       mitigations.get(mit_id, {}).get('description', ''), '')
+
+def iter_connection_rows(projects):
+    """Yield every canvas connection across projects"""
+    for project_name, project_info in projects.items():
+        for conn in project_info.get('canvas_connections', []):
+            yield (project_name, conn['source'], conn['type'], conn['target'],
+                   conn.get('risk') or '', conn.get('mitigation') or '', conn.get('created', ''))
+
+def iter_risk_library_rows(risks):
+    """Yield the risk library"""
+    for risk_id, risk_info in risks.items():
+        yield (risk_id, risk_info['description'], risk_info.get('impact', ''),
+               risk_info.get('likelihood', ''), risk_info.get('domain', ''))
+
+def iter_mitigation_library_rows(mitigations):
+    """Yield the mitigation library"""
+    for mit_id, mit_info in mitigations.items():
+        yield (mit_id, mit_info['description'], mit_info.get('domain', ''),
+               ', '.join(mit_info.get('mapped_risks', [])),
+               mit_info.get('effectiveness', ''), mit_info.get('cost', ''))
+
+def iter_export_rows(dataset, projects, risks, mitigations):
+    """Return a row iterator over the given data for an export dataset"""
+    if dataset == 'Project Overview':
+        return iter_overview_rows(projects)
+    if dataset == 'Domain Assignments':
+        return iter_assignment_rows(projects, risks, mitigations)
+    if dataset == 'Connections':
+        return iter_connection_rows(projects)
+    if dataset == 'Risk Library':
+        return iter_risk_library_rows(risks)
+    if dataset == 'Mitigation Library':
+        return iter_mitigation_library_rows(mitigations)
+    raise ValueError(f"Unknown export dataset: {dataset}")
+
+def iter_row_chunks(rows, size=EXPORT_CHUNK_SIZE):
+    """Group a row iterator into lists of at most ``size`` rows"""
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+def write_csv_export(columns, rows, out):
+    """Write rows to ``out`` as CSV one chunk at a time, returning the row count"""
+    count = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, kind in columns])
+    
+    for chunk in iter_row_chunks(rows):
+        writer.writerows(chunk)
+        out.write(buffer.getvalue().encode('utf-8'))
+        buffer.seek(0)
+        buffer.truncate()
+        count += len(chunk)
+    
+    out.write(buffer.getvalue().encode('utf-8'))
+    return count
+
+def write_parquet_export(columns, rows, out):
+    """Write rows to ``out`` as Parquet, one row group per chunk, returning the row count"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    schema = pa.schema([(name, pa.int64() if kind == 'int' else pa.string()) for name, kind in columns])
+    count = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        for chunk in iter_row_chunks(rows):
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            count += len(chunk)
+    return count
+
+def write_excel_export(columns, rows, out, sheet_name):
+    """Write rows to ``out`` as an Excel workbook using streaming worksheets, returning the row count
+    
+    Rows beyond Excel's per-sheet limit roll over to continuation sheets.
+    """
+    from openpyxl import Workbook
+    
+    workbook = Workbook(write_only=True)
+    header = [name for name, kind in columns]
+    sheet = None
+    sheet_rows = EXCEL_MAX_ROWS
+    
+    count = 0
+    for chunk in iter_row_chunks(rows):
+        for row in chunk:
+            if sheet_rows == EXCEL_MAX_ROWS:
+                part = len(workbook.worksheets) + 1
+                title = sheet_name[:31] if part == 1 else f"{sheet_name[:25]} ({part})"
+                sheet = workbook.create_sheet(title=title)
+                sheet.append(header)
+                sheet_rows = 1
+            sheet.append(row)
+            sheet_rows += 1
+        count += len(chunk)
+    
+    if sheet is None:
+        workbook.create_sheet(title=sheet_name[:31]).append(header)
+    workbook.save(out)
+    return count
+
+def build_export(dataset, export_format):
+    """Stream a dataset into a spooled temporary file in the requested format"""
+    columns = EXPORT_DATASETS[dataset]
+    rows = iter_export_rows(dataset, st.session_state.projects, st.session_state.risks, st.session_state.mitigations)
+    out = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    
+    if export_format == "Parquet":
+        count = write_parquet_export(columns, rows, out)
+        extension, mime = "parquet", "application/vnd.apache.parquet"
+    elif export_format == "Excel":
+        count = write_excel_export(columns, rows, out, dataset)
+        extension, mime = "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    else:
+        count = write_csv_export(columns, rows, out)
+        extension, mime = "csv", "text/csv"
+    
+    # Read the finished file once; the spool is closed and only the bytes are kept until download
+    out.seek(0)
+    data = out.read()
+    out.close()
+    
+    slug = dataset.lower().replace(' ', '_')
+    return {
+        'dataset': dataset,
+        'format': export_format,
+        'data': data,
+        'rows': count,
+        'file_name': f"{slug}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}",
+        'mime': mime
+    }
+
+def discard_prepared_export(key):
+    """Drop a prepared export once it has been downloaded"""
+    st.session_state.prepared_exports.pop(key, None)
+
+def render_export_controls(datasets, key):
+    """Render dataset and format pickers with prepare and download buttons"""
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        dataset = st.selectbox("Dataset", datasets, key=f"{key}_dataset")
+    with col2:
+        export_format = st.selectbox("Format", EXPORT_FORMATS, key=f"{key}_format")
+    with col3:
+        st.write("")
+        st.write("")
+        prepare = st.button("📦 Prepare Export", key=f"{key}_prepare")
+    
+    if prepare:
+        discard_prepared_export(key)
+        try:
+            st.session_state.prepared_exports[key] = build_export(dataset, export_format)
+        except ImportError as e:
+            st.error(f"{export_format} export requires the '{e.name}' package to be installed.")
+    
+    prepared = st.session_state.prepared_exports.get(key)
+    if prepared and prepared['dataset'] == dataset and prepared['format'] == export_format:
+        st.download_button(f"⬇️ Download {dataset} ({export_format})", prepared['data'],
+                           file_name=prepared['file_name'], mime=prepared['mime'], key=f"{key}_download",
+                           on_click=discard_prepared_export, args=(key,))
+        st.caption(f"{prepared['rows']} rows exported")
 
 def admin_section():
     """Admin section for managing master data"""
@@ -447,15 +1267,15 @@ def admin_section():
             with col2:
                 risk_impact = st.selectbox("Impact Level", ["Low", "Medium", "High", "Critical"])
                 risk_domain = st.selectbox("Primary Domain", 
-                    ["", "People", "Services", "Applications", "Network", "Data", "Information", "Products", "Process", "Facilities", "Platforms"])
+                    ["", *DOMAINS])
             
             if st.button("➕ Add Risk"):
                 if risk_id and risk_description:
-                    st.session_state.risks[risk_id] = {
+                    get_canvas_store().put_library_entries('risks', {risk_id: {
                         'description': risk_description,
                         'impact': risk_impact,
                         'domain': risk_domain
-                    }
+                    }})
                     st.success(f"✅ Risk {risk_id} added successfully!")
                     st.rerun()
         
@@ -472,7 +1292,7 @@ def admin_section():
                         st.info("Edit functionality - to be implemented")
                 with col3:
                     if st.button("🗑️ Delete", key=f"delete_risk_{risk_id}"):
-                        del st.session_state.risks[risk_id]
+                        get_canvas_store().delete_library_entry('risks', risk_id)
                         st.success(f"Risk {risk_id} deleted!")
                         st.rerun()
                 st.markdown("---")
@@ -488,17 +1308,17 @@ def admin_section():
                 mit_description = st.text_area("Mitigation Description")
             with col2:
                 mit_domain = st.selectbox("Implementation Domain", 
-                    ["", "People", "Services", "Applications", "Network", "Data", "Information", "Products", "Process", "Facilities", "Platforms"])
+                    ["", *DOMAINS])
                 available_risks = list(st.session_state.risks.keys())
                 mapped_risks = st.multiselect("Addresses Risks", available_risks)
             
             if st.button("➕ Add Mitigation"):
                 if mit_id and mit_description:
-                    st.session_state.mitigations[mit_id] = {
+                    get_canvas_store().put_library_entries('mitigations', {mit_id: {
                         'description': mit_description,
                         'domain': mit_domain,
                         'mapped_risks': mapped_risks
-                    }
+                    }})
                     st.success(f"✅ Mitigation {mit_id} added successfully!")
                     st.rerun()
         
@@ -515,10 +1335,13 @@ def admin_section():
                         st.info("Edit functionality - to be implemented")
                 with col3:
                     if st.button("🗑️ Delete", key=f"delete_mit_{mit_id}"):
-                        del st.session_state.mitigations[mit_id]
+                        get_canvas_store().delete_library_entry('mitigations', mit_id)
                         st.success(f"Mitigation {mit_id} deleted!")
                         st.rerun()
                 st.markdown("---")
+    
+    with st.expander("📤 Export Libraries"):
+        render_export_controls(["Risk Library", "Mitigation Library"], "admin_export")
 
 def project_management():
     """Project management with canvas and domain management"""
@@ -539,7 +1362,7 @@ def project_management():
     with col2:
         if st.button("🗑️ Delete Project", disabled=selected_project == "➕ Create New Project..."):
             if selected_project in st.session_state.projects:
-                del st.session_state.projects[selected_project]
+                get_canvas_store().delete_project(selected_project)
                 st.session_state.current_project = None
                 st.success(f"Project '{selected_project}' deleted!")
                 st.rerun()
@@ -555,37 +1378,25 @@ def project_management():
         with col2:
             project_owner = st.text_input("Project Owner", placeholder="Your name")
             project_status = st.selectbox("Initial Status", ["Open", "In Progress", "Closed"])
+            template_options = ([f"📐 {name}" for name in st.session_state.project_templates] +
+                                [f"📋 Clone of {name}" for name in project_names])
+            start_from = st.selectbox("Start From", template_options,
+                                      help="Start from a template or clone an existing project")
         
         if st.button("🚀 Create Project"):
-            if new_project_name:
-                project_id = str(uuid.uuid4())[:8]
-                st.session_state.projects[new_project_name] = {
-                    'id': project_id,
-                    'description': project_description,
-                    'owner': project_owner,
-                    'status': project_status,
-                    'created_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    'canvas_connections': [],
-                    # Initialize all domain elements
-                    'People_elements': ['Customer', 'User', 'Admin'],
-                    'Services_elements': [],
-                    'Applications_elements': [],
-                    'Network_elements': [],
-                    'Data_elements': [],
-                    'Information_elements': [],
-                    'Products_elements': [],
-                    'Process_elements': [],
-                    'Facilities_elements': [],
-                    'Platforms_elements': [],
-                    # Initialize risks and mitigations
-                    'People_risks': [], 'Services_risks': [], 'Applications_risks': [], 'Network_risks': [],
-                    'Data_risks': [], 'Information_risks': [], 'Products_risks': [], 'Process_risks': [],
-                    'Facilities_risks': [], 'Platforms_risks': [],
-                    'People_mitigations': [], 'Services_mitigations': [], 'Applications_mitigations': [], 
-                    'Network_mitigations': [], 'Data_mitigations': [], 'Information_mitigations': [],
-                    'Products_mitigations': [], 'Process_mitigations': [], 'Facilities_mitigations': [], 
-                    'Platforms_mitigations': []
-                }
+            if new_project_name in st.session_state.projects:
+                st.error(f"A project named '{new_project_name}' already exists")
+            elif new_project_name:
+                if start_from.startswith("📐 "):
+                    source = st.session_state.project_templates[start_from[len("📐 "):]]
+                else:
+                    source = st.session_state.projects[start_from[len("📋 Clone of "):]]
+                get_canvas_store().put_projects({new_project_name: clone_project_data(
+                    source,
+                    description=project_description,
+                    owner=project_owner,
+                    status=project_status
+                )})
                 st.session_state.current_project = new_project_name
                 st.success(f"✅ Project '{new_project_name}' created successfully!")
                 st.rerun()
@@ -602,7 +1413,8 @@ def project_management():
             new_status = st.selectbox("Status", ["Open", "In Progress", "Closed"], 
                                     index=["Open", "In Progress", "Closed"].index(project_data['status']))
             if new_status != project_data['status']:
-                project_data['status'] = new_status
+                with get_canvas_store().edit(st.session_state.current_project):
+                    project_data['status'] = new_status
                 st.rerun()
         with col3:
             st.write(f"**Owner:** {project_data['owner']}")
@@ -611,6 +1423,25 @@ def project_management():
         if project_data['description']:
             st.info(f"📋 **Description:** {project_data['description']}")
         
+        with st.expander("📋 Clone Project or Save as Template"):
+            col1, col2 = st.columns(2)
+            with col1:
+                clone_name = st.text_input("Clone Name", value=f"{selected_project} (copy)")
+                if st.button("📋 Clone Project"):
+                    if clone_name in st.session_state.projects:
+                        st.error(f"A project named '{clone_name}' already exists")
+                    elif clone_name:
+                        get_canvas_store().put_projects({clone_name: clone_project_data(project_data, status="Open")})
+                        st.session_state.current_project = clone_name
+                        st.success(f"✅ Project '{clone_name}' cloned from '{selected_project}'")
+                        st.rerun()
+            with col2:
+                template_name = st.text_input("Template Name", value=selected_project)
+                if st.button("💾 Save as Template"):
+                    if template_name:
+                        get_canvas_store().put_template(template_name, build_template_from_project(project_data))
+                        st.success(f"✅ Template '{template_name}' saved")
+        
         st.markdown("---")
         
         # Main interactive canvas
@@ -618,26 +1449,60 @@ def project_management():
         
         # Domain management interface
         render_domain_management(project_data)
+        
+        # Snapshots and version comparison
+        render_project_history(project_data)
+
+def freeze_project_data(project_data):
+    """Convert a project's list values to tuples so they can be shared with clones
+    
+    Only needed for project data from outside the app, such as a loaded file;
+    every write site in the app already stores tuples.
+    """
+    for key, value in project_data.items():
+        if isinstance(value, list):
+            project_data[key] = tuple(value)
+    return project_data
+
+def clone_project_data(source, **overrides):
+    """Create a project sharing all domain data with ``source`` until either side is edited
+    
+    Edits always replace a domain's tuple rather than modifying it, so the clone
+    only costs a new top-level dict and its connections, which are stamped with
+    the clone's creation time.
+    """
+    now = datetime.now()
+    clone = dict(source)
+    clone['id'] = str(uuid.uuid4())[:8]
+    clone['created_date'] = now.strftime("%Y-%m-%d %H:%M:%S")
+    clone['canvas_connections'] = tuple({**conn, 'created': now.isoformat()}
+                                        for conn in source.get('canvas_connections', ()))
+    clone.pop('snapshots', None)  # A clone starts its own history
+    clone.update(overrides)
+    return clone
+
+def build_template_from_project(project_data):
+    """Capture a project's domain data and connections as a reusable template"""
+    return {key: tuple(value) for key, value in project_data.items()
+            if key == 'canvas_connections' or key.endswith(('_elements', '_risks', '_mitigations'))}
 
 def render_domain_management(project_data):
     """Render domain management interface"""
     st.markdown("### 🏗️ Domain Management")
     
-    domains = ["People", "Services", "Applications", "Network", "Data", "Information", "Products", "Process", "Facilities", "Platforms"]
     
-    selected_domain = st.selectbox("Select Domain to Manage", domains)
+    selected_domain = st.selectbox("Select Domain to Manage", DOMAINS)
     
     elements_key = f'{selected_domain}_elements'
     risks_key = f'{selected_domain}_risks'
     mitigations_key = f'{selected_domain}_mitigations'
     
     # Initialize if not exists
-    if elements_key not in project_data:
-        project_data[elements_key] = []
-    if risks_key not in project_data:
-        project_data[risks_key] = []
-    if mitigations_key not in project_data:
-        project_data[mitigations_key] = []
+    missing = [key for key in (elements_key, risks_key, mitigations_key) if key not in project_data]
+    if missing:
+        with get_canvas_store().edit(st.session_state.current_project):
+            for key in missing:
+                project_data[key] = ()
     
     col1, col2, col3 = st.columns(3)
     
@@ -648,7 +1513,8 @@ def render_domain_management(project_data):
         new_element = st.text_input(f"Add element to {selected_domain}")
         if st.button(f"Add Element"):
             if new_element and new_element not in project_data[elements_key]:
-                project_data[elements_key].append(new_element)
+                with get_canvas_store().edit(st.session_state.current_project):
+                    project_data[elements_key] = (*project_data[elements_key], new_element)
                 st.success(f"Added {new_element}")
                 st.rerun()
         
@@ -660,7 +1526,8 @@ def render_domain_management(project_data):
                     st.write(f"• {element}")
                 with col_b:
                     if st.button("🗑️", key=f"del_elem_{selected_domain}_{i}"):
-                        project_data[elements_key].remove(element)
+                        with get_canvas_store().edit(st.session_state.current_project):
+                            project_data[elements_key] = tuple(e for e in project_data[elements_key] if e != element)
                         st.rerun()
         else:
             st.info("No elements defined")
@@ -676,7 +1543,14 @@ def render_domain_management(project_data):
             default=project_data[risks_key],
             format_func=lambda x: f"{x}: {st.session_state.risks[x]['description'][:30]}..."
         )
-        project_data[risks_key] = selected_risks
+        if tuple(selected_risks) != project_data[risks_key]:
+            with get_canvas_store().edit(st.session_state.current_project):
+                project_data[risks_key] = tuple(selected_risks)
+        
+        suggested_risks, _ = suggest_element_threats(get_threat_index(), selected_domain, project_data[elements_key])
+        unassigned = [risk_id for risk_id, score in suggested_risks if risk_id not in selected_risks]
+        if unassigned:
+            st.caption(f"💡 Suggested for these elements: {', '.join(unassigned)}")
         
         # Display risk details
         if selected_risks:
@@ -698,7 +1572,9 @@ def render_domain_management(project_data):
             default=project_data[mitigations_key],
             format_func=lambda x: f"{x}: {st.session_state.mitigations[x]['description'][:30]}..."
         )
-        project_data[mitigations_key] = selected_mitigations
+        if tuple(selected_mitigations) != project_data[mitigations_key]:
+            with get_canvas_store().edit(st.session_state.current_project):
+                project_data[mitigations_key] = tuple(selected_mitigations)
         
         # Display mitigation details
         if selected_mitigations:
@@ -710,15 +1586,180 @@ def render_domain_management(project_data):
         else:
             st.info("No mitigations assigned")
 
+def render_project_history(project_data):
+    """Render snapshot saving and version comparison for a project"""
+    st.markdown("### 🕓 Project History")
+    
+    snapshots = project_data.get('snapshots', ())
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        snapshot_label = st.text_input("Snapshot Label", placeholder="e.g., Before design review")
+    with col2:
+        st.write("")
+        st.write("")
+        if st.button("📸 Save Snapshot"):
+            label = snapshot_label or f"Snapshot {len(snapshots) + 1}"
+            snapshot = capture_project_snapshot(project_data, label, st.session_state.risks, st.session_state.mitigations)
+            with get_canvas_store().edit(st.session_state.current_project):
+                project_data['snapshots'] = snapshots = (*project_data.get('snapshots', ()), snapshot)[-PROJECT_SNAPSHOT_LIMIT:]
+            st.success(f"✅ Snapshot '{label}' saved")
+    
+    if not snapshots:
+        st.info("No snapshots saved yet. Save one to compare future changes against it.")
+        return
+    
+    # Select snapshots by position: labels and save times need not be unique
+    def describe(index):
+        return "📍 Current state" if index is None else f"{snapshots[index]['label']} ({snapshots[index]['created']})"
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        base_index = st.selectbox("Compare From", range(len(snapshots)), index=len(snapshots) - 1, format_func=describe)
+    with col2:
+        compare_index = st.selectbox("Compare To", [None, *range(len(snapshots))], format_func=describe)
+    
+    base = snapshots[base_index]
+    if compare_index is None:
+        other = capture_project_snapshot(project_data, "Current state", st.session_state.risks, st.session_state.mitigations)
+    else:
+        other = snapshots[compare_index]
+    
+    diff = diff_project_snapshots(base, other)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Completion %", diff['completion'][1], delta=diff['completion'][1] - diff['completion'][0])
+    with col2:
+        st.metric("Risk Exposure", diff['exposure'][1], delta=diff['exposure'][1] - diff['exposure'][0],
+                  delta_color="inverse", help="Impact x likelihood of assigned risks not covered by a domain mitigation")
+    with col3:
+        st.metric("Changed Domains", len(diff['domains']))
+    
+    if not diff['domains'] and not any(diff['connections'].values()):
+        st.info("No changes between the selected versions")
+        return
+    
+    for domain, changes in diff['domains'].items():
+        st.write(f"**{domain}**")
+        for kind, (added, removed) in changes.items():
+            if added:
+                st.write(f"➕ {kind.title()}: {', '.join(added)}")
+            if removed:
+                st.write(f"➖ {kind.title()}: {', '.join(removed)}")
+    
+    if any(diff['connections'].values()):
+        st.write("**Connections**")
+        for source, conn_type, target, *_ in diff['connections']['added']:
+            st.write(f"➕ {source} {conn_type} {target}")
+        for source, conn_type, target, *_ in diff['connections']['removed']:
+            st.write(f"➖ {source} {conn_type} {target}")
+        for (source, conn_type, target, *_), before, after in diff['connections']['changed']:
+            st.write(f"✏️ {source} {conn_type} {target}: risk {before['risk']} → {after['risk']}, "
+                     f"mitigation {before['mitigation']} → {after['mitigation']}")
+
+def connection_key_map(connections):
+    """Key connections by (source, type, target, created, occurrence) so keys survive deletions
+    
+    The creation timestamp tells apart connections with the same endpoints and
+    type; the occurrence only breaks ties between connections created together.
+    """
+    seen = {}
+    keyed = {}
+    for conn in connections:
+        base = (conn['source'], conn['type'], conn['target'], conn.get('created', ''))
+        occurrence = seen.get(base, 0)
+        seen[base] = occurrence + 1
+        keyed[base + (occurrence,)] = {'risk': conn.get('risk'), 'mitigation': conn.get('mitigation')}
+    return keyed
+
+def capture_project_snapshot(project_data, label, risks, mitigations):
+    """Capture an immutable, content-hashed copy of a project's domains and connections"""
+    
+    domain_state = {}
+    for domain in DOMAINS:
+        content = (
+            tuple(project_data.get(f'{domain}_elements', [])),
+            tuple(project_data.get(f'{domain}_risks', [])),
+            tuple(project_data.get(f'{domain}_mitigations', []))
+        )
+        domain_state[domain] = {
+            'hash': hashlib.sha256(json.dumps(content).encode()).hexdigest(),
+            'elements': content[0],
+            'risks': content[1],
+            'mitigations': content[2]
+        }
+    
+    # Stored as (key, value) pairs: snapshots are saved with the project, and JSON has no tuple keys
+    connections = tuple(sorted(connection_key_map(project_data.get('canvas_connections', [])).items()))
+    
+    return {
+        'label': label,
+        'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'domains': domain_state,
+        'connections': connections,
+        'connections_hash': hashlib.sha256(json.dumps(connections, default=str).encode()).hexdigest(),
+        'completion': calculate_completion_score(project_data),
+        'exposure': calculate_risk_exposure(project_data, risks, mitigations)
+    }
+
+def diff_project_snapshots(old, new):
+    """Compare two snapshots, skipping domains whose content hash is unchanged"""
+    domain_changes = {}
+    for domain, new_state in new['domains'].items():
+        old_state = old['domains'].get(domain)
+        if old_state and old_state['hash'] == new_state['hash']:
+            continue
+        
+        changes = {}
+        for kind in ('elements', 'risks', 'mitigations'):
+            before = set(old_state[kind]) if old_state else set()
+            after = set(new_state[kind])
+            if before != after:
+                changes[kind] = (sorted(after - before), sorted(before - after))
+        if changes:
+            domain_changes[domain] = changes
+    
+    connection_changes = {'added': [], 'removed': [], 'changed': []}
+    if old['connections_hash'] != new['connections_hash']:
+        before = {tuple(key): value for key, value in old['connections']}
+        after = {tuple(key): value for key, value in new['connections']}
+        connection_changes['added'] = sorted(after.keys() - before.keys())
+        connection_changes['removed'] = sorted(before.keys() - after.keys())
+        connection_changes['changed'] = [(key, before[key], after[key])
+                                         for key in sorted(before.keys() & after.keys())
+                                         if before[key] != after[key]]
+    
+    return {
+        'domains': domain_changes,
+        'connections': connection_changes,
+        'completion': (old['completion'], new['completion']),
+        'exposure': (old['exposure'], new['exposure'])
+    }
+
+def calculate_risk_exposure(project_data, risks, mitigations):
+    """Sum impact x likelihood of assigned risks not covered by a mitigation in the same domain"""
+    
+    exposure = 0
+    for domain in DOMAINS:
+        covered = {r for mit_id in project_data.get(f'{domain}_mitigations', [])
+                   for r in mitigations.get(mit_id, {}).get('mapped_risks', [])}
+        for risk_id in project_data.get(f'{domain}_risks', []):
+            if risk_id in covered:
+                continue
+            risk_info = risks.get(risk_id, {})
+            exposure += (RISK_LEVEL_WEIGHTS.get(risk_info.get('impact'), 2) *
+                         RISK_LEVEL_WEIGHTS.get(risk_info.get('likelihood'), 2))
+    return exposure
+
 def calculate_completion_score(project_data):
     """Calculate project completion percentage"""
     score = 0
-    domains = ["People", "Services", "Applications", "Network", "Data", "Information", "Products", "Process", "Facilities", "Platforms"]
     
     # Domain elements (30 points)
-    populated_domains = sum(1 for domain in domains 
+    populated_domains = sum(1 for domain in DOMAINS 
                            if len(project_data.get(f'{domain}_elements', [])) > 0)
-    score += (populated_domains / len(domains)) * 30
+    score += (populated_domains / len(DOMAINS)) * 30
     
     # Connections (25 points)
     connections = len(project_data.get('canvas_connections', []))
@@ -726,19 +1767,715 @@ def calculate_completion_score(project_data):
         score += min(25, connections * 5)
     
     # Risk assignment (25 points)
-    total_risks = sum(len(project_data.get(f'{domain}_risks', [])) for domain in domains)
+    total_risks = sum(len(project_data.get(f'{domain}_risks', [])) for domain in DOMAINS)
     if total_risks > 0:
         score += min(25, total_risks * 3)
     
     # Mitigation assignment (20 points)
-    total_mitigations = sum(len(project_data.get(f'{domain}_mitigations', [])) for domain in domains)
+    total_mitigations = sum(len(project_data.get(f'{domain}_mitigations', [])) for domain in DOMAINS)
     if total_mitigations > 0:
         score += min(20, total_mitigations * 3)
     
     return min(100, int(score))
 
+def project_metric_vector(project_data, risks, mitigations):
+    """Compute a project's METRIC_COLUMNS values"""
+    status = project_data.get('status')
+    domain_elements = [len(project_data.get(f'{domain}_elements', ())) for domain in DOMAINS]
+    domain_risks = [len(project_data.get(f'{domain}_risks', ())) for domain in DOMAINS]
+    
+    return np.array([
+        1,
+        status == 'Open',
+        status == 'In Progress',
+        status == 'Closed',
+        calculate_completion_score(project_data),
+        calculate_risk_exposure(project_data, risks, mitigations),
+        sum(domain_elements),
+        len(project_data.get('canvas_connections', ())),
+        sum(domain_risks),
+        sum(len(project_data.get(f'{domain}_mitigations', ())) for domain in DOMAINS)
+    ] + domain_elements + domain_risks, dtype=np.float32)
+
+def new_metric_series():
+    """Create an empty array-backed series of (day, metric vector) points"""
+    return {
+        'days': np.zeros(METRICS_INITIAL_CAPACITY, dtype=np.int32),
+        'values': np.zeros((METRICS_INITIAL_CAPACITY, len(METRIC_COLUMNS)), dtype=np.float32),
+        'size': 0
+    }
+
+def new_metrics_store():
+    """Create an empty metrics history store
+    
+    Portfolio rollups are kept as per-day and per-week deltas so recording a
+    change is O(metrics) and a trend is one cumulative sum over pre-aggregated
+    rows. Daily deltas older than the portfolio retention window are folded
+    into the daily base; weekly deltas are kept indefinitely.
+    """
+    return {
+        'last': {},
+        'projects': {},
+        'daily': {'start': None, 'deltas': np.zeros((0, len(METRIC_COLUMNS))), 'base': np.zeros(len(METRIC_COLUMNS))},
+        'weekly': {'start': None, 'deltas': np.zeros((0, len(METRIC_COLUMNS)))},
+        'compacted_day': None
+    }
+
+def add_rollup_delta(rollup, index, delta):
+    """Add a delta to a rollup bucket, growing the delta array as needed"""
+    if rollup['start'] is None:
+        rollup['start'] = index
+    offset = max(index - rollup['start'], 0)
+    
+    deltas = rollup['deltas']
+    if offset >= len(deltas):
+        grown = np.zeros((max(offset + 1, len(deltas) * 2, METRICS_INITIAL_CAPACITY), deltas.shape[1]))
+        grown[:len(deltas)] = deltas
+        rollup['deltas'] = deltas = grown
+    deltas[offset] += delta
+
+def append_metric_point(series, day, vector):
+    """Append a point to a series, overwriting the last point if it is from the same day"""
+    size = series['size']
+    if size and series['days'][size - 1] == day:
+        series['values'][size - 1] = vector
+        return
+    
+    if size == len(series['days']):
+        series['days'] = np.concatenate([series['days'], np.zeros(size, dtype=np.int32)])
+        series['values'] = np.concatenate([series['values'], np.zeros_like(series['values'])])
+    series['days'][size] = day
+    series['values'][size] = vector
+    series['size'] = size + 1
+
+def record_project_metrics(store, project_name, vector, day=None):
+    """Record a project's metrics if they changed since the last recording"""
+    day = day or date.today().toordinal()
+    previous = store['last'].get(project_name)
+    if previous is not None and np.array_equal(previous, vector):
+        return False
+    
+    delta = vector.astype(np.float64) - (previous if previous is not None else 0)
+    add_rollup_delta(store['daily'], day, delta)
+    add_rollup_delta(store['weekly'], (day - 1) // 7, delta)
+    append_metric_point(store['projects'].setdefault(project_name, new_metric_series()), day, vector)
+    store['last'][project_name] = vector
+    
+    if store['compacted_day'] != day:
+        compact_metrics_store(store, day)
+    return True
+
+def remove_project_metrics(store, project_name, day=None):
+    """Drop a deleted project from the portfolio totals from today onwards"""
+    if project_name in store['last']:
+        record_project_metrics(store, project_name, np.zeros(len(METRIC_COLUMNS), dtype=np.float32), day)
+        del store['last'][project_name]
+        del store['projects'][project_name]
+
+def compact_metrics_store(store, today):
+    """Apply retention: fold old daily deltas into the base and thin old project points to weekly"""
+    store['compacted_day'] = today
+    
+    daily = store['daily']
+    cutoff = today - METRICS_PORTFOLIO_DAILY_RETENTION
+    if daily['start'] is not None and daily['start'] < cutoff:
+        drop = cutoff - daily['start']
+        daily['base'] = daily['base'] + daily['deltas'][:drop].sum(axis=0)
+        daily['deltas'] = daily['deltas'][drop:]
+        daily['start'] = cutoff
+    
+    cutoff = today - METRICS_DAILY_RETENTION
+    for series in store['projects'].values():
+        size = series['size']
+        days = series['days'][:size]
+        old = days < cutoff
+        if not old.any():
+            continue
+        
+        # Keep the last point of each old week and every point inside the window
+        weeks = (days - 1) // 7
+        last_of_week = np.append(weeks[1:] != weeks[:-1], True)
+        keep = np.flatnonzero(~old | last_of_week)
+        if len(keep) == size:
+            continue
+        series['days'][:len(keep)] = days[keep]
+        series['values'][:len(keep)] = series['values'][:size][keep]
+        series['size'] = len(keep)
+
+def pack_metrics_store(store):
+    """Flatten a metrics history store into named arrays for ``np.savez``"""
+    names = list(store['projects'])
+    series = [store['projects'][name] for name in names]
+    width = len(METRIC_COLUMNS)
+    starts = [store['daily']['start'], store['weekly']['start'], store['compacted_day']]
+    return {
+        'names': np.array(names, dtype=str),
+        'sizes': np.array([s['size'] for s in series], dtype=np.int64),
+        'days': np.concatenate([s['days'][:s['size']] for s in series] or [np.zeros(0, dtype=np.int32)]),
+        'values': np.concatenate([s['values'][:s['size']] for s in series] or [np.zeros((0, width), dtype=np.float32)]),
+        'last': np.array([store['last'][name] for name in names], dtype=np.float32).reshape(-1, width),
+        'daily_deltas': store['daily']['deltas'].copy(),
+        'daily_base': np.array(store['daily']['base'], dtype=np.float64),
+        'weekly_deltas': store['weekly']['deltas'].copy(),
+        'starts': np.array([-1 if start is None else start for start in starts], dtype=np.int64)
+    }
+
+def unpack_metrics_store(arrays):
+    """Rebuild a metrics history store from the arrays of ``pack_metrics_store``"""
+    store = new_metrics_store()
+    bounds = np.cumsum(arrays['sizes'])[:-1]
+    for name, days, values, last in zip(arrays['names'], np.split(arrays['days'], bounds),
+                                        np.split(arrays['values'], bounds), arrays['last']):
+        capacity = max(len(days), METRICS_INITIAL_CAPACITY)
+        series = {'days': np.zeros(capacity, dtype=np.int32),
+                  'values': np.zeros((capacity, len(METRIC_COLUMNS)), dtype=np.float32),
+                  'size': len(days)}
+        series['days'][:len(days)] = days
+        series['values'][:len(days)] = values
+        store['projects'][str(name)] = series
+        store['last'][str(name)] = last
+    
+    daily_start, weekly_start, compacted_day = (None if start < 0 else int(start) for start in arrays['starts'])
+    store['daily'] = {'start': daily_start, 'deltas': arrays['daily_deltas'], 'base': arrays['daily_base']}
+    store['weekly'] = {'start': weekly_start, 'deltas': arrays['weekly_deltas']}
+    store['compacted_day'] = compacted_day
+    return store
+
+def rollup_totals(rollup, current, base=0):
+    """Cumulative totals of a rollup from its first bucket up to and including ``current``"""
+    count = current - rollup['start'] + 1
+    deltas = rollup['deltas'][:count]
+    if len(deltas) < count:
+        deltas = np.vstack([deltas, np.zeros((count - len(deltas), deltas.shape[1]))])
+    return base + np.cumsum(deltas, axis=0)
+
+def portfolio_trend(store, resolution="Daily", days=365):
+    """Return portfolio totals per day or week as a DataFrame indexed by date"""
+    today = date.today().toordinal()
+    
+    if resolution == "Weekly":
+        rollup = store['weekly']
+        if rollup['start'] is None:
+            return pd.DataFrame(columns=METRIC_COLUMNS)
+        totals = rollup_totals(rollup, (today - 1) // 7)
+        index = [date.fromordinal(7 * (rollup['start'] + i) + 1) for i in range(len(totals))]
+        frame = pd.DataFrame(totals, index=pd.to_datetime(index), columns=METRIC_COLUMNS)
+    else:
+        rollup = store['daily']
+        if rollup['start'] is None:
+            return pd.DataFrame(columns=METRIC_COLUMNS)
+        totals = rollup_totals(rollup, today, rollup['base'])
+        index = pd.date_range(date.fromordinal(rollup['start']), periods=len(totals), freq='D')
+        frame = pd.DataFrame(totals, index=index, columns=METRIC_COLUMNS)
+    
+    return frame[frame.index >= pd.Timestamp(date.today() - timedelta(days=days))]
+
+def project_trend(store, project_name, resolution="Daily", days=365):
+    """Return one project's metrics per day or week, carrying values forward between changes"""
+    series = store['projects'].get(project_name)
+    if not series or not series['size']:
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+    
+    size = series['size']
+    index = pd.to_datetime([date.fromordinal(int(d)) for d in series['days'][:size]])
+    frame = pd.DataFrame(series['values'][:size], index=index, columns=METRIC_COLUMNS)
+    frame = frame.reindex(pd.date_range(index[0], pd.Timestamp(date.today()), freq='D')).ffill()
+    if resolution == "Weekly":
+        frame = frame.resample('W-MON', label='left', closed='left').last()
+    
+    return frame[frame.index >= pd.Timestamp(date.today() - timedelta(days=days))]
+
+def render_portfolio_trends():
+    """Render trend charts from the pre-aggregated metrics history"""
+    st.subheader("📉 Trends")
+    
+    store = get_canvas_store()
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        scope = st.selectbox("Trend Scope", ["📚 Portfolio"] + list(st.session_state.projects.keys()), key="trend_scope")
+    with col2:
+        resolution = st.radio("Resolution", ["Daily", "Weekly"], horizontal=True, key="trend_resolution")
+    with col3:
+        period = st.selectbox("Period", ["30 days", "90 days", "1 year"], index=1, key="trend_period")
+    
+    days = {"30 days": 30, "90 days": 90, "1 year": 365}[period]
+    with store.lock:
+        if scope == "📚 Portfolio":
+            frame = portfolio_trend(store.metrics, resolution, days)
+        else:
+            frame = project_trend(store.metrics, scope, resolution, days)
+    
+    if frame.empty:
+        st.info("No history recorded yet. Trends build up as projects change.")
+        return
+    
+    projects = frame['Projects'].where(frame['Projects'] > 0)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("**Status**")
+        st.line_chart(frame[['Open', 'In Progress', 'Closed']])
+        st.write("**Average Completion % and Risk Exposure**")
+        st.line_chart(pd.DataFrame({
+            'Completion %': frame['Completion %'] / projects,
+            'Risk Exposure': frame['Risk Exposure'] / projects
+        }))
+    with col2:
+        st.write("**Architecture Size**")
+        st.line_chart(frame[['Elements', 'Connections', 'Risks', 'Mitigations']])
+        st.write("**Domain Elements**")
+        domain_columns = [f'{domain} Elements' for domain in DOMAINS]
+        populated = [c for c in domain_columns if frame[c].any()]
+        if populated:
+            st.line_chart(frame[populated].rename(columns=lambda c: c.replace(' Elements', '')))
+        else:
+            st.info("No domain elements recorded yet")
+
+@st.cache_resource
+def get_report_pool():
+    """Shared worker processes and artefact caches used by every session
+    
+    Rendering is CPU-bound, so it runs in separate processes rather than
+    competing for the GIL with the sessions' script threads. Workers are spawned
+    rather than forked because the server process is multi-threaded.
+    """
+    return {
+        'executor': ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context('spawn')),
+        'lock': threading.Lock(),
+        'sections': OrderedDict(),
+        'artefacts': OrderedDict(),
+        'bytes': {'sections': 0, 'artefacts': 0}
+    }
+
+def report_task(name):
+    """Look up a report function on this file's importable module
+    
+    Streamlit executes the script as ``__main__``, which worker processes cannot
+    import, so tasks are submitted by reference to the module of the same name.
+    """
+    return getattr(importlib.import_module(os.path.splitext(os.path.basename(__file__))[0]), name)
+
+def report_cache_get(pool, kind, key):
+    """Fetch an entry from one of the report pool's LRU caches"""
+    with pool['lock']:
+        if key not in pool[kind]:
+            return None
+        pool[kind].move_to_end(key)
+        return pool[kind][key][0]
+
+def report_cache_put(pool, kind, key, value, size, protected=()):
+    """Store an entry in one of the report pool's LRU caches, evicting by total size
+    
+    Keys in ``protected`` are never evicted. Jobs protect all of their own
+    sections, so a portfolio larger than the budget is not scanned out of the
+    cache by itself and its next report only rebuilds the projects that changed.
+    """
+    cache = pool[kind]
+    with pool['lock']:
+        if key in cache:
+            pool['bytes'][kind] -= cache[key][1]
+        cache[key] = (value, size)
+        cache.move_to_end(key)
+        pool['bytes'][kind] += size
+        
+        if pool['bytes'][kind] > REPORT_CACHE_BYTES[kind]:
+            for old_key in [k for k in cache if k != key and k not in protected]:
+                pool['bytes'][kind] -= cache.pop(old_key)[1]
+                if pool['bytes'][kind] <= REPORT_CACHE_BYTES[kind]:
+                    break
+
+def collect_referenced_library(project_data, risks, mitigations):
+    """Return the risk and mitigation library entries a project refers to"""
+    connections = project_data.get('canvas_connections', [])
+    
+    mit_ids = {m for domain in DOMAINS for m in project_data.get(f'{domain}_mitigations', [])}
+    mit_ids.update(c['mitigation'] for c in connections if c.get('mitigation'))
+    risk_ids = {r for domain in DOMAINS for r in project_data.get(f'{domain}_risks', [])}
+    risk_ids.update(c['risk'] for c in connections if c.get('risk'))
+    for mit_id in mit_ids:
+        risk_ids.update(mitigations.get(mit_id, {}).get('mapped_risks', []))
+    
+    return ({r: risks[r] for r in sorted(risk_ids) if r in risks},
+            {m: mitigations[m] for m in sorted(mit_ids) if m in mitigations})
+
+def snapshot_report_inputs(project_names):
+    """Serialise the projects to report on so workers never touch live session state
+    
+    The serialised payload doubles as the cache key: a project's report is only
+    regenerated once the project or a library entry it references changes.
+    """
+    snapshots = []
+    for name in project_names:
+        project_data = {key: value for key, value in st.session_state.projects[name].items() if key != 'snapshots'}
+        risks, mitigations = collect_referenced_library(project_data, st.session_state.risks, st.session_state.mitigations)
+        payload = json.dumps({'name': name, 'project': project_data, 'risks': risks, 'mitigations': mitigations},
+                             sort_keys=True, default=str)
+        snapshots.append({
+            'fingerprint': hashlib.sha256(payload.encode()).hexdigest(),
+            'payload': payload
+        })
+    return snapshots
+
+def build_project_report(name, project_data, risks, mitigations):
+    """Assemble the content of one project's security architecture report"""
+    
+    domain_sections = []
+    for domain in DOMAINS:
+        elements = project_data.get(f'{domain}_elements', [])
+        risk_ids = project_data.get(f'{domain}_risks', [])
+        mit_ids = project_data.get(f'{domain}_mitigations', [])
+        if not (elements or risk_ids or mit_ids):
+            continue
+        
+        domain_mits = [{
+            'id': mit_id,
+            'description': mitigations.get(mit_id, {}).get('description', 'Unknown mitigation'),
+            'mapped_risks': mitigations.get(mit_id, {}).get('mapped_risks', [])
+        } for mit_id in mit_ids]
+        
+        domain_risks = [{
+            'id': risk_id,
+            'description': risks.get(risk_id, {}).get('description', 'Unknown risk'),
+            'impact': risks.get(risk_id, {}).get('impact', 'Unknown'),
+            'covered_by': [m['id'] for m in domain_mits if risk_id in m['mapped_risks']]
+        } for risk_id in risk_ids]
+        
+        covered = sum(1 for r in domain_risks if r['covered_by'])
+        domain_sections.append({
+            'domain': domain,
+            'elements': list(elements),
+            'risks': domain_risks,
+            'mitigations': domain_mits,
+            'coverage': int(covered / len(domain_risks) * 100) if domain_risks else None
+        })
+    
+    connections = project_data.get('canvas_connections', [])
+    figure = build_element_canvas_figure(project_data, compute_element_layout(project_data))
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png', dpi=80)
+    
+    return {
+        'name': name,
+        'id': project_data.get('id', ''),
+        'owner': project_data.get('owner', ''),
+        'status': project_data.get('status', ''),
+        'description': project_data.get('description', ''),
+        'created': project_data.get('created_date', '')[:10],
+        'completion': calculate_completion_score(project_data),
+        'domains': domain_sections,
+        'connections': [{
+            'source': c['source'],
+            'type': c['type'],
+            'target': c['target'],
+            'risk': c.get('risk'),
+            'mitigation': c.get('mitigation')
+        } for c in connections],
+        'diagram': buffer.getvalue()
+    }
+
+def render_project_report_html(report):
+    """Render one project's report as an HTML fragment"""
+    esc = html.escape
+    parts = [
+        f"<section><h2>{esc(report['name'])}</h2>",
+        f"<p><b>ID:</b> {esc(report['id'])} | <b>Owner:</b> {esc(report['owner'])} | "
+        f"<b>Status:</b> {esc(report['status'])} | <b>Created:</b> {esc(report['created'])} | "
+        f"<b>Completion:</b> {report['completion']}%</p>"
+    ]
+    if report['description']:
+        parts.append(f"<p>{esc(report['description'])}</p>")
+    
+    diagram = base64.b64encode(report['diagram']).decode()
+    parts.append(f'<img src="data:image/png;base64,{diagram}" alt="Architecture canvas" style="max-width:100%">')
+    
+    for section in report['domains']:
+        coverage = f"{section['coverage']}% of risks mitigated" if section['coverage'] is not None else "no risks assigned"
+        parts.append(f"<h3>{esc(section['domain'])} <small>({coverage})</small></h3>")
+        if section['elements']:
+            parts.append(f"<p><b>Elements:</b> {esc(', '.join(section['elements']))}</p>")
+        if section['risks']:
+            parts.append("<table><tr><th>Risk</th><th>Description</th><th>Impact</th><th>Mitigated By</th></tr>")
+            for risk in section['risks']:
+                covered_by = ', '.join(risk['covered_by']) or '⚠️ Not covered'
+                parts.append(f"<tr><td>{esc(risk['id'])}</td><td>{esc(risk['description'])}</td>"
+                             f"<td>{esc(risk['impact'])}</td><td>{esc(covered_by)}</td></tr>")
+            parts.append("</table>")
+        if section['mitigations']:
+            parts.append("<table><tr><th>Mitigation</th><th>Description</th><th>Addresses</th></tr>")
+            for mit in section['mitigations']:
+                parts.append(f"<tr><td>{esc(mit['id'])}</td><td>{esc(mit['description'])}</td>"
+                             f"<td>{esc(', '.join(mit['mapped_risks']))}</td></tr>")
+            parts.append("</table>")
+    
+    if report['connections']:
+        parts.append("<h3>Connections</h3><table><tr><th>Source</th><th>Type</th><th>Target</th><th>Risk</th><th>Mitigation</th></tr>")
+        for conn in report['connections']:
+            parts.append(f"<tr><td>{esc(conn['source'])}</td><td>{esc(conn['type'])}</td><td>{esc(conn['target'])}</td>"
+                         f"<td>{esc(conn['risk'] or '')}</td><td>{esc(conn['mitigation'] or '')}</td></tr>")
+        parts.append("</table>")
+    
+    parts.append("</section>")
+    return "\n".join(parts)
+
+def render_report_html(title, reports):
+    """Render a full HTML report document for one or more projects"""
+    esc = html.escape
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>",
+        f"<title>{esc(title)}</title>",
+        "<style>body{font-family:sans-serif;margin:2rem;color:#222}"
+        "table{border-collapse:collapse;margin:0.5rem 0 1rem}"
+        "th,td{border:1px solid #E0E0E0;padding:4px 8px;text-align:left;font-size:13px}"
+        "th{background:#F8F9FA}section{border-top:3px solid #1976D2;margin-top:2rem}</style>",
+        "</head><body>",
+        f"<h1>🛡️ {esc(title)}</h1>",
+        f"<p>Generated {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>"
+    ]
+    
+    if len(reports) > 1:
+        parts.append("<table><tr><th>Project</th><th>Status</th><th>Owner</th><th>Completion %</th></tr>")
+        for report in reports:
+            parts.append(f"<tr><td>{esc(report['name'])}</td><td>{esc(report['status'])}</td>"
+                         f"<td>{esc(report['owner'])}</td><td>{report['completion']}</td></tr>")
+        parts.append("</table>")
+    
+    parts.extend(render_project_report_html(report) for report in reports)
+    parts.append("</body></html>")
+    return "\n".join(parts).encode('utf-8')
+
+def report_text_lines(report):
+    """Flatten a project report into plain text lines for paginated output"""
+    lines = [
+        f"{report['name']}  ({report['status']}, owner: {report['owner']}, completion: {report['completion']}%)",
+        ""
+    ]
+    for section in report['domains']:
+        coverage = f"{section['coverage']}% mitigated" if section['coverage'] is not None else "no risks"
+        lines.append(f"{section['domain']} ({coverage})")
+        if section['elements']:
+            lines.append(f"    Elements: {', '.join(section['elements'])}"[:120])
+        for risk in section['risks']:
+            covered_by = ', '.join(risk['covered_by']) or 'NOT COVERED'
+            lines.append(f"    Risk {risk['id']} [{risk['impact']}] {risk['description'][:60]} -> {covered_by}")
+        for mit in section['mitigations']:
+            lines.append(f"    Mitigation {mit['id']} {mit['description'][:60]} (addresses: {', '.join(mit['mapped_risks'])})")
+        lines.append("")
+    
+    if report['connections']:
+        lines.append("Connections")
+        for conn in report['connections']:
+            extra = ''.join([f" risk: {conn['risk']}" if conn['risk'] else '',
+                             f" mitigation: {conn['mitigation']}" if conn['mitigation'] else ''])
+            lines.append(f"    {conn['source']} {conn['type']} {conn['target']}{extra}")
+    return lines
+
+def render_report_pdf(title, reports):
+    """Render an image-based PDF report with a diagram page and text pages per project"""
+    buffer = io.BytesIO()
+    with PdfPages(buffer) as pdf:
+        if len(reports) > 1:
+            summary = [f"{r['name']}: {r['status']}, {r['completion']}% complete" for r in reports]
+            write_pdf_text_pages(pdf, title, summary)
+        
+        for report in reports:
+            fig = Figure(figsize=(11.69, 8.27))
+            ax = fig.add_axes([0.02, 0.02, 0.96, 0.9])
+            ax.imshow(mpimg.imread(io.BytesIO(report['diagram']), format='png'))
+            ax.axis('off')
+            fig.suptitle(f"{title} - {report['name']}", fontsize=14)
+            pdf.savefig(fig)
+            
+            write_pdf_text_pages(pdf, report['name'], report_text_lines(report))
+    
+    return buffer.getvalue()
+
+def write_pdf_text_pages(pdf, heading, lines):
+    """Write lines of text to as many A4 pages as needed"""
+    for start in range(0, max(len(lines), 1), REPORT_LINES_PER_PAGE):
+        fig = Figure(figsize=(8.27, 11.69))
+        fig.text(0.05, 0.96, heading, fontsize=12, fontweight='bold', va='top')
+        fig.text(0.05, 0.93, "\n".join(lines[start:start + REPORT_LINES_PER_PAGE]),
+                 fontsize=7, family='monospace', va='top')
+        pdf.savefig(fig)
+
+def build_report_section(payload):
+    """Worker entry point: build one project's report section from its serialised inputs"""
+    data = json.loads(payload)
+    return build_project_report(data['name'], data['project'], data['risks'], data['mitigations'])
+
+def render_report_artefact(title, report_format, reports):
+    """Worker entry point: render the final report document"""
+    if report_format == "PDF":
+        return render_report_pdf(title, reports)
+    return render_report_html(title, reports)
+
+def start_report_job(pool, job, snapshots):
+    """Build missing project sections on the worker processes, then render the artefact
+    
+    Progress is reported from future callbacks, so the session only reads the
+    job dict. Sections are kept for the job as well as cached, so concurrent
+    jobs evicting them cannot fail this one.
+    """
+    sections = {}
+    pending = {}
+    for snapshot in snapshots:
+        report = report_cache_get(pool, 'sections', snapshot['fingerprint'])
+        if report is None:
+            pending[snapshot['fingerprint']] = snapshot['payload']
+        else:
+            sections[snapshot['fingerprint']] = report
+    
+    protected = frozenset(sections) | frozenset(pending)
+    job_lock = threading.Lock()
+    job['done'] = len(sections)
+    job['status'] = 'Running'
+    
+    def fail(error):
+        job['status'] = 'Failed'
+        job['error'] = str(error)
+    
+    def artefact_done(future):
+        if future.exception():
+            fail(future.exception())
+            return
+        artefact = future.result()
+        report_cache_put(pool, 'artefacts', job['artefact_key'], artefact, len(artefact))
+        job['done'] += 1
+        job['status'] = 'Done'
+    
+    def render():
+        reports = [sections[snapshot['fingerprint']] for snapshot in snapshots]
+        future = pool['executor'].submit(report_task('render_report_artefact'), job['title'], job['format'], reports)
+        future.add_done_callback(artefact_done)
+    
+    def section_done(fingerprint, future):
+        if future.exception():
+            fail(future.exception())
+            return
+        report = future.result()
+        report_cache_put(pool, 'sections', fingerprint, report,
+                         len(report['diagram']) + len(pending[fingerprint]), protected)
+        with job_lock:
+            sections[fingerprint] = report
+            job['done'] += 1
+            finished = len(sections) == len(protected)
+        if finished and job['status'] != 'Failed':
+            render()
+    
+    if not pending:
+        render()
+    for fingerprint, payload in pending.items():
+        future = pool['executor'].submit(report_task('build_report_section'), payload)
+        future.add_done_callback(lambda f, fingerprint=fingerprint: section_done(fingerprint, f))
+
+def submit_report_job(title, project_names, report_format):
+    """Queue a report on the shared worker pool, reusing a cached artefact when nothing changed"""
+    pool = get_report_pool()
+    snapshots = snapshot_report_inputs(project_names)
+    key_parts = [title, report_format] + [s['fingerprint'] for s in snapshots]
+    
+    job = {
+        'id': str(uuid.uuid4())[:8],
+        'title': title,
+        'format': report_format,
+        'total': len(snapshots) + 1,
+        'done': 0,
+        'status': 'Queued',
+        'error': None,
+        'artefact_key': hashlib.sha256("|".join(key_parts).encode()).hexdigest(),
+        'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    
+    if report_cache_get(pool, 'artefacts', job['artefact_key']) is not None:
+        job['done'] = job['total']
+        job['status'] = 'Done'
+    else:
+        start_report_job(pool, job, snapshots)
+    
+    st.session_state.report_jobs.insert(0, job)
+    del st.session_state.report_jobs[REPORT_JOB_HISTORY:]
+    return job
+
+def reports_section():
+    """Reports page for generating project and portfolio reports in the background"""
+    st.header("📄 Reports")
+    
+    if not st.session_state.projects:
+        st.info("🚀 No projects yet. Create a project before generating reports.")
+        return
+    
+    project_names = list(st.session_state.projects.keys())
+    portfolio_option = "📚 Portfolio (all projects)"
+    
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        scope = st.selectbox("Report Scope", [portfolio_option] + project_names)
+    with col2:
+        report_format = st.selectbox("Format", REPORT_FORMATS)
+    with col3:
+        st.write("")
+        st.write("")
+        generate = st.button("🚀 Generate Report")
+    
+    if generate:
+        if scope == portfolio_option:
+            job = submit_report_job("Security Architecture Portfolio Report", project_names, report_format)
+        else:
+            job = submit_report_job(f"Security Architecture Report - {scope}", [scope], report_format)
+        st.success(f"✅ Report {job['id']} queued. You can keep working while it is generated.")
+    
+    st.markdown("---")
+    st.subheader("🗂️ Report Jobs")
+    
+    if not st.session_state.report_jobs:
+        st.info("No reports generated in this session yet")
+        return
+    
+    # Poll progress in a fragment while jobs are running, without rerunning the page
+    active = any(job['status'] in ('Queued', 'Running') for job in st.session_state.report_jobs)
+    st.fragment(render_report_jobs, run_every=REPORT_POLL_SECONDS if active else None)(active)
+
+def render_report_jobs(polling):
+    """Render the session's report jobs with their progress and downloads"""
+    pool = get_report_pool()
+    for job in st.session_state.report_jobs:
+        col1, col2, col3 = st.columns([3, 2, 1])
+        
+        with col1:
+            st.write(f"**{job['title']}** ({job['format']})")
+            st.caption(f"Job {job['id']} | Requested {job['created']}")
+        
+        with col2:
+            st.progress(job['done'] / job['total'], text=f"{job['status']} - {job['done']}/{job['total']} steps")
+            if job['error']:
+                st.error(job['error'])
+        
+        with col3:
+            if job['status'] == 'Done':
+                artefact = report_cache_get(pool, 'artefacts', job['artefact_key'])
+                if artefact is None:
+                    st.caption("Expired - generate again")
+                else:
+                    extension, mime = ("pdf", "application/pdf") if job['format'] == "PDF" else ("html", "text/html")
+                    st.download_button("⬇️ Download", artefact,
+                                       file_name=f"security_report_{job['id']}.{extension}",
+                                       mime=mime, key=f"download_report_{job['id']}")
+        st.markdown("---")
+    
+    # Stop polling with one full rerun once every job has finished
+    if polling and not any(job['status'] in ('Queued', 'Running') for job in st.session_state.report_jobs):
+        st.rerun()
+
 def main():
     """Main application function"""
+    # Page config; set here rather than at import so the module can be used headless
+    st.set_page_config(
+        page_title="Security Architecture Canvas",
+        page_icon="🛡️",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    
     initialize_session_state()
     
     # Custom CSS for better visual appearance
@@ -780,7 +2517,7 @@ def main():
     
     page = st.sidebar.selectbox(
         "Select Page:",
-        ["🏠 Dashboard", "📁 Project Canvas", "🔧 Administration"],
+        ["🏠 Dashboard", "📁 Project Canvas", "📄 Reports", "🔧 Administration"],
         format_func=lambda x: x.split(' ', 1)[1]  # Remove emoji from display
     )
     
@@ -796,10 +2533,9 @@ def main():
         st.sidebar.write(f"**Owner:** {project_data.get('owner', 'Unknown')}")
         
         # Quick stats
-        domains = ["People", "Services", "Applications", "Network", "Data", "Information", "Products", "Process", "Facilities", "Platforms"]
-        total_elements = sum(len(project_data.get(f'{domain}_elements', [])) for domain in domains)
-        total_risks = sum(len(project_data.get(f'{domain}_risks', [])) for domain in domains)
-        total_mitigations = sum(len(project_data.get(f'{domain}_mitigations', [])) for domain in domains)
+        total_elements = sum(len(project_data.get(f'{domain}_elements', [])) for domain in DOMAINS)
+        total_risks = sum(len(project_data.get(f'{domain}_risks', [])) for domain in DOMAINS)
+        total_mitigations = sum(len(project_data.get(f'{domain}_mitigations', [])) for domain in DOMAINS)
         
         st.sidebar.metric("Elements", total_elements)
         st.sidebar.metric("Risks", total_risks)  
@@ -823,6 +2559,8 @@ def main():
     - Map risks & mitigations
     - Define interactions
     
+    **📄 Reports**: Generate project and portfolio reports in the background
+    
     **🔧 Administration**: Manage master data:
     - Risk library
     - Mitigation library
@@ -847,8 +2585,11 @@ def main():
             dashboard()
         elif page.startswith("📁"):
             project_management()
+        elif page.startswith("📄"):
+            reports_section()
         elif page.startswith("🔧"):
             admin_section()
+
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
         st.info("Please refresh the page or contact support if the issue persists.")
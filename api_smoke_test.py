@@ -0,0 +1,194 @@
+"""Smoke test for the headless HTTP API of the Security Architecture Canvas.
+
+Drives every endpoint of ``archystry_api`` in-process with Starlette's
+``TestClient``, including malformed requests that must be rejected with a 4xx
+response rather than a server error. The app runs against a store persisted to
+a temporary file, so the lifespan shutdown flush is checked by reloading it,
+and every UI page is then rendered over that file to check that the UI can
+display what the API wrote.
+
+Usage (``TestClient`` needs ``httpx``, which the app itself does not):
+    pip install httpx
+    python api_smoke_test.py
+"""
+import json
+import os
+import sys
+import tempfile
+
+from starlette.testclient import TestClient
+from streamlit.testing.v1 import AppTest
+
+import Archystry as canvas
+from archystry_api import create_app
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Archystry.py")
+UI_PAGES = ["🏠 Dashboard", "📁 Project Canvas", "📄 Reports", "🔧 Administration"]
+PROJECT = "Smoke Project"
+TEMPLATE = "Smoke Template"
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def smoke_checks():
+    """Yield (name, method, path, body, expected status, check on the response or None)"""
+    base = f"/api/projects/{PROJECT}"
+
+    yield "create project", "POST", "/api/projects", {'name': PROJECT, 'owner': "smoke"}, 201, None
+    yield "duplicate project", "POST", "/api/projects", {'name': PROJECT}, 409, None
+    yield "create body not an object", "POST", "/api/projects", [PROJECT], 400, None
+    yield "unknown template", "POST", "/api/projects", {'name': "T", 'template': ["x"]}, 400, None
+    yield "batch create", "POST", "/api/projects/batch", {'projects': [
+        {'name': "Batch A", 'template': "Three-Tier Web Application"},
+        {'name': "Batch B", 'clone_of': "Batch A"},
+        "not an object",
+        {'name': "Batch C", 'owner': 7}
+    ]}, 200, lambda r: [bool(item.get('error')) for item in r.json()['results']] == [False, False, True, True]
+    yield "list projects", "GET", "/api/projects", None, 200, lambda r: len(ndjson(r)) == 3
+    yield "get project", "GET", base, None, 200, lambda r: r.json()['owner'] == "smoke"
+    yield "update project", "PATCH", base, {'status': "In Progress", 'description': "smoke"}, 200, None
+    yield "update bad status", "PATCH", base, {'status': "Done"}, 400, None
+    yield "update owner not a string", "PATCH", base, {'owner': ["a"]}, 400, None
+    yield "update description not a string", "PATCH", base, {'description': {}}, 400, None
+
+    yield "add elements", "POST", f"{base}/elements", {'domain': "Services", 'elements': ["API", "Queue"]}, 200, \
+        lambda r: r.json()['changed'] == 2
+    yield "elements not strings", "POST", f"{base}/elements", {'domain': "Services", 'elements': [1]}, 400, None
+    yield "remove elements", "DELETE", f"{base}/elements", {'domain': "Services", 'elements': ["Queue"]}, 200, \
+        lambda r: r.json()['changed'] == 1
+    yield "sync elements", "POST", "/api/sync/elements", {'mode': "merge", 'items': [
+        {'project': PROJECT, 'domain': "Data", 'elements': ["CRM"]},
+        {'project': "Missing", 'domain': "Data", 'elements': ["CRM"]},
+        ["not an object"]
+    ]}, 200, lambda r: r.json()['changed'] == 1 and len(r.json()['errors']) == 2
+
+    yield "set assignments", "PUT", f"{base}/assignments", \
+        {'domain': "Services", 'risks': ["ADV001"], 'mitigations': ["MIT001"]}, 200, None
+    yield "risks not a list", "PUT", f"{base}/assignments", {'domain': "Services", 'risks': "ADV001"}, 400, None
+    yield "mitigations not strings", "PUT", f"{base}/assignments", {'domain': "Services", 'mitigations': [1]}, 400, None
+    yield "unknown risk", "PUT", f"{base}/assignments", {'domain': "Services", 'risks': ["NOPE"]}, 400, None
+    yield "coverage", "GET", f"{base}/coverage", None, 200, lambda r: r.json()['domains']['Services']['coverage'] == 100
+
+    yield "add connections", "POST", f"{base}/connections", {'connections': [
+        {'source': "People", 'target': "Services", 'risk': "ADV001"},
+        {'source': "Services", 'target': "Data", 'type': "<<uses>>"}
+    ]}, 201, lambda r: r.json()['added'] == 2
+    yield "connection not an object", "POST", f"{base}/connections", {'connections': ["People"]}, 400, None
+    yield "connection bad domain", "POST", f"{base}/connections", {'connections': [{'source': [], 'target': "Data"}]}, \
+        400, None
+    yield "list connections", "GET", f"{base}/connections", None, 200, lambda r: len(ndjson(r)) == 2
+    yield "delete connection", "DELETE", f"{base}/connections/0", None, 200, None
+    yield "delete missing connection", "DELETE", f"{base}/connections/5", None, 404, None
+
+    yield "upsert risks", "POST", "/api/risks", {'risks': [
+        {'id': "SMK001", 'description': "Smoke risk", 'impact': "High", 'extra': 1}
+    ]}, 200, None
+    yield "risk without impact", "POST", "/api/risks", {'risks': [{'id': "SMK002", 'description': "x"}]}, 400, None
+    yield "risk with unknown impact", "POST", "/api/risks", {'risks': [
+        {'id': "SMK002", 'description': "x", 'impact': "Severe"}
+    ]}, 400, None
+    yield "risk description not a string", "POST", "/api/risks", {'risks': [
+        {'id': "SMK002", 'description': ["x"], 'impact': "Low"}
+    ]}, 400, None
+    yield "risk with unknown domain", "POST", "/api/risks", {'risks': [
+        {'id': "SMK002", 'description': "x", 'impact': "Low", 'domain': "Cloud"}
+    ]}, 400, None
+    yield "risk id not a string", "POST", "/api/risks", {'risks': [{'id': 1, 'description': "x", 'impact': "Low"}]}, \
+        400, None
+    yield "upsert mitigations", "POST", "/api/mitigations", {'mitigations': [
+        {'id': "SMK-M1", 'description': "Smoke mitigation", 'mapped_risks': ["SMK001"]},
+        {'id': "SMK-M2", 'description': "Kept mitigation", 'domain': "Data", 'effectiveness': "High"}
+    ]}, 200, None
+    yield "mapped risks not a list", "POST", "/api/mitigations", {'mitigations': [
+        {'id': "SMK-M3", 'description': "x", 'mapped_risks': "SMK001"}
+    ]}, 400, None
+    yield "mitigation with unknown cost", "POST", "/api/mitigations", {'mitigations': [
+        {'id': "SMK-M3", 'description': "x", 'cost': 3}
+    ]}, 400, None
+    yield "list risks", "GET", "/api/risks", None, 200, lambda r: [
+        (row['Impact'], row['Domain']) for row in ndjson(r) if row['Risk ID'] == "SMK001"] == [("High", "")]
+    yield "delete mitigation", "DELETE", "/api/mitigations/SMK-M1", None, 200, None
+    yield "unknown library", "GET", "/api/threats", None, 404, None
+
+    for dataset in canvas.EXPORT_DATASETS:
+        slug = dataset.lower().replace(' ', '-')
+        header = canvas.EXPORT_DATASETS[dataset][0][0]
+        yield f"export {slug}", "GET", f"/api/export/{slug}", None, 200, \
+            lambda r, header=header: r.text.startswith(header)
+    yield "export ndjson", "GET", "/api/export/connections?format=ndjson", None, 200, lambda r: len(ndjson(r)) >= 1
+    yield "unknown dataset", "GET", "/api/export/nothing", None, 404, None
+    yield "invalid JSON", "POST", "/api/projects", "{", 400, None
+
+    yield "create from saved template", "POST", "/api/projects", {'name': "From Template", 'template': TEMPLATE}, 201, None
+    yield "saved template applied", "GET", "/api/projects/From Template", None, 200, \
+        lambda r: r.json()['Data_elements'] == ["Smoke Vault"]
+    yield "delete templated project", "DELETE", "/api/projects/From Template", None, 200, None
+    yield "delete project", "DELETE", "/api/projects/Batch B", None, 200, None
+    yield "delete missing project", "DELETE", "/api/projects/Batch B", None, 404, None
+
+
+def run_checks(client):
+    """Run every check and return the names of those that failed"""
+    failures = []
+    for name, method, path, body, expected, check in smoke_checks():
+        if isinstance(body, str):
+            response = client.request(method, path, content=body, headers={'Content-Type': "application/json"})
+        else:
+            response = client.request(method, path, json=body)
+        ok = response.status_code == expected and (check is None or check(response))
+        print(f"{'ok' if ok else 'FAIL':>4}  {response.status_code}  {name}")
+        if not ok:
+            failures.append(f"{name}: {response.status_code} {response.text[:200]}")
+    return failures
+
+
+def check_ui(path):
+    """Render every page of the UI over the store the API saved; returns any errors"""
+    os.environ['ARCHYSTRY_DATA'] = path
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.run()
+    failures = []
+    for page in UI_PAGES:
+        at.sidebar.selectbox[0].set_value(page)
+        at.run()
+        failures += [f"{page}: {element.value}" for element in [*at.exception, *at.error]]
+    return failures
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "canvas_store.json")
+        store = canvas.CanvasStore(path)
+        # Saved the way the UI's "Save as Template" does
+        store.put_template(TEMPLATE, canvas.build_template_from_project({'Data_elements': ("Smoke Vault",)}))
+        # Entering and leaving the client runs the app's lifespan, whose shutdown flushes the store
+        with TestClient(create_app(store), raise_server_exceptions=False) as client:
+            failures = run_checks(client)
+
+        # Read the file before closing the store, so only the lifespan flush can have written it
+        with open(path) as f:
+            saved = json.load(f)
+        store.close()
+        if sorted(saved['projects']) != sorted([PROJECT, "Batch A"]) or "SMK001" not in saved['risks']:
+            failures.append(f"store not flushed on shutdown: {sorted(saved['projects'])}")
+        if saved['risks'].get("SMK001") != {'description': "Smoke risk", 'domain': "", 'impact': "High"}:
+            failures.append(f"risk not normalised: {saved['risks'].get('SMK001')}")
+        if list(saved['templates']) != [TEMPLATE]:
+            failures.append(f"saved templates not persisted alone: {list(saved['templates'])}")
+        if saved['mitigations'].get("SMK-M2", {}).get('mapped_risks') != []:
+            failures.append(f"mitigation not normalised: {saved['mitigations'].get('SMK-M2')}")
+        failures += check_ui(path)
+        leftovers = [name for name in os.listdir(directory) if name.endswith(".tmp")]
+        if leftovers:
+            failures.append(f"temporary files left behind: {leftovers}")
+
+    for failure in failures:
+        print(f"FAIL  {failure}")
+    print(f"{'Smoke test failed' if failures else 'All checks passed'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
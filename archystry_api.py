@@ -0,0 +1,574 @@
+"""Headless async HTTP API for the Security Architecture Canvas.
+
+Exposes the project, library and connection operations of the Streamlit UI for
+automation such as CMDB syncs. Large listings are streamed as NDJSON (or CSV for
+exports) in chunks, and batch endpoints apply many changes per request.
+
+The API works on the same ``CanvasStore`` as the Streamlit UI. To share it
+with analysts, serve the API from the Streamlit process, so a CMDB sync lands
+in the projects they edit:
+
+    ARCHYSTRY_API_PORT=8600 ARCHYSTRY_DATA=canvas_store.json streamlit run Archystry.py
+
+Run standalone only for headless use, and never against a data file that a
+running Streamlit process is also saving:
+
+    python archystry_api.py --port 8600 --data canvas_store.json
+
+Writes hold the store lock (see ``CanvasStore.edit``). Everything that takes
+the lock, and every heavy read, runs on a thread pool, so a UI session or a
+large sync holding the lock never stalls the event loop. Streamed listings
+read copy-on-write snapshots of the store.
+
+Endpoints:
+    GET    /api/projects                          stream project overview rows
+    POST   /api/projects                          create a project (built-in or saved template / clone_of)
+    POST   /api/projects/batch                    create many projects
+    GET    /api/projects/{name}                   full project data
+    PATCH  /api/projects/{name}                   update description, owner or status
+    DELETE /api/projects/{name}
+    POST   /api/projects/{name}/elements          add elements to a domain
+    DELETE /api/projects/{name}/elements          remove elements from a domain
+    PUT    /api/projects/{name}/assignments       set a domain's risks and/or mitigations
+    GET    /api/projects/{name}/connections       stream connections
+    POST   /api/projects/{name}/connections       add connections (batch)
+    DELETE /api/projects/{name}/connections/{i}
+    GET    /api/projects/{name}/coverage          risk coverage, completion and exposure
+    POST   /api/sync/elements                     bulk merge/replace elements across projects
+    GET    /api/{risks|mitigations}               stream a library
+    POST   /api/{risks|mitigations}               upsert library entries (batch)
+    DELETE /api/{risks|mitigations}/{id}
+    GET    /api/export/{dataset}?format=csv       stream an export dataset (csv or ndjson)
+"""
+import argparse
+import asyncio
+import csv
+import io
+import itertools
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+import Archystry as canvas
+
+STATUSES = ["Open", "In Progress", "Closed"]
+INTERACTION_TYPES = ["<<creates>>", "<<manages>>", "<<uses>>", "<<serves>>",
+                     "<<connects>>", "<<secures>>", "<<monitors>>", "<<controls>>"]
+STREAM_CHUNK_SIZE = 500
+API_WORKERS = 4
+
+
+async def run_blocking(request, fn, *args):
+    """Run a blocking function on the app's thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(request.app.state.pool, fn, *args)
+
+
+def require(condition, message, status_code=400):
+    if not condition:
+        raise HTTPException(status_code=status_code, detail=message)
+
+
+def is_str_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def is_level(value):
+    return isinstance(value, str) and value in canvas.RISK_LEVEL_WEIGHTS
+
+
+def get_library(store, kind):
+    require(kind in ('risks', 'mitigations'), f"Unknown library: {kind}", 404)
+    return store.risks if kind == 'risks' else store.mitigations
+
+
+def get_project(store, name):
+    require(isinstance(name, str) and name in store.projects, f"Unknown project: {name}", 404)
+    return store.projects[name]
+
+
+def build_project(store, spec, pending=None):
+    """Build a project from a template (default 'Blank Architecture') or by cloning another project
+
+    ``pending`` holds projects built earlier in the same batch, which may be cloned.
+    """
+    pending = pending or {}
+    require(isinstance(spec, dict), "Each project must be a JSON object")
+    name = spec.get('name')
+    require(isinstance(name, str) and name, "Project 'name' is required")
+    require(name not in store.projects and name not in pending, f"Project already exists: {name}", 409)
+    status = spec.get('status', 'Open')
+    require(status in STATUSES, f"Invalid status: {status}")
+    for key in ('description', 'owner'):
+        require(isinstance(spec.get(key, ''), str), f"'{key}' must be a string")
+
+    if spec.get('clone_of'):
+        require(isinstance(spec['clone_of'], str), "'clone_of' must be a project name")
+        source = pending.get(spec['clone_of']) or get_project(store, spec['clone_of'])
+    else:
+        template = spec.get('template', 'Blank Architecture')
+        require(isinstance(template, str) and template in store.templates, f"Unknown template: {template}")
+        source = store.templates[template]
+
+    return canvas.clone_project_data(
+        source,
+        description=spec.get('description', ''),
+        owner=spec.get('owner', ''),
+        status=status
+    )
+
+
+def update_elements(project_data, domain, elements, mode):
+    """Merge, replace or remove a domain's elements; returns the number of elements changed"""
+    require(domain in canvas.DOMAINS, f"Invalid domain: {domain}")
+    require(is_str_list(elements), "'elements' must be a list of strings")
+
+    key = f'{domain}_elements'
+    current = project_data.get(key, ())
+    if mode == 'replace':
+        updated = tuple(dict.fromkeys(elements))
+        changed = len(set(current) ^ set(updated))
+    elif mode == 'remove':
+        removing = set(elements)
+        updated = tuple(e for e in current if e not in removing)
+        changed = len(current) - len(updated)
+    else:
+        existing = set(current)
+        added = tuple(e for e in dict.fromkeys(elements) if e not in existing)
+        updated = (*current, *added)
+        changed = len(added)
+
+    if changed:
+        project_data[key] = updated
+    return changed
+
+
+def build_connection(spec, risks, mitigations, index):
+    """Validate a connection spec and build it in the shape the UI stores"""
+    require(isinstance(spec, dict), "Each connection must be a JSON object")
+    source, target = spec.get('source'), spec.get('target')
+    require(isinstance(source, str) and source in canvas.DOMAIN_POSITIONS, f"Invalid source domain: {source}")
+    require(isinstance(target, str) and target in canvas.DOMAIN_POSITIONS and target != source,
+            f"Invalid target domain: {target}")
+    conn_type = spec.get('type', '<<connects>>')
+    require(conn_type in INTERACTION_TYPES, f"Invalid interaction type: {conn_type}")
+    for key, library in (('risk', risks), ('mitigation', mitigations)):
+        value = spec.get(key)
+        require(value is None or (isinstance(value, str) and value in library), f"Unknown {key}: {value}")
+
+    return {
+        'id': f"{source}-{target}-{index}",
+        'source': source,
+        'target': target,
+        'type': conn_type,
+        'risk': spec.get('risk'),
+        'mitigation': spec.get('mitigation'),
+        'created': datetime.now().isoformat()
+    }
+
+
+def build_library_entry(kind, entry, risks):
+    """Validate a risk or mitigation entry against the fields the UI reads; returns (id, fields)
+
+    Optional fields get the defaults the UI's add forms use; unknown fields are dropped.
+    """
+    require(isinstance(entry, dict), "Each entry must be a JSON object")
+    entry_id, description = entry.get('id'), entry.get('description')
+    require(isinstance(entry_id, str) and entry_id, "Each entry needs a string 'id'")
+    require(isinstance(description, str) and description, f"{entry_id}: 'description' must be a non-empty string")
+    domain = entry.get('domain', '')
+    require(domain == '' or domain in canvas.DOMAINS, f"{entry_id}: invalid domain: {domain}")
+    fields = {'description': description, 'domain': domain}
+
+    levels = ', '.join(canvas.RISK_LEVEL_WEIGHTS)
+    if kind == 'risks':
+        require(is_level(entry.get('impact')), f"{entry_id}: 'impact' must be one of {levels}")
+        fields['impact'] = entry['impact']
+        optional = ('likelihood',)
+    else:
+        fields['mapped_risks'] = entry.get('mapped_risks', [])
+        require(is_str_list(fields['mapped_risks']), f"{entry_id}: 'mapped_risks' must be a list of strings")
+        unknown = [r for r in fields['mapped_risks'] if r not in risks]
+        require(not unknown, f"{entry_id}: unknown risks: {', '.join(unknown)}")
+        optional = ('effectiveness', 'cost')
+
+    for key in optional:
+        if key in entry:
+            require(is_level(entry[key]), f"{entry_id}: '{key}' must be one of {levels}")
+            fields[key] = entry[key]
+    return entry_id, fields
+
+
+def project_coverage(project_data, risks, mitigations):
+    """Per-domain risk coverage by the domain's mitigations, plus completion and exposure"""
+    domains = {}
+    for domain in canvas.DOMAINS:
+        assigned = project_data.get(f'{domain}_risks', ())
+        covered = {r for mit_id in project_data.get(f'{domain}_mitigations', ())
+                   for r in mitigations.get(mit_id, {}).get('mapped_risks', [])}
+        if assigned:
+            domains[domain] = {
+                'risks': len(assigned),
+                'covered': sorted(r for r in assigned if r in covered),
+                'uncovered': sorted(r for r in assigned if r not in covered),
+                'coverage': int(sum(1 for r in assigned if r in covered) / len(assigned) * 100)
+            }
+
+    return {
+        'completion': canvas.calculate_completion_score(project_data),
+        'exposure': canvas.calculate_risk_exposure(project_data, risks, mitigations),
+        'domains': domains
+    }
+
+
+def next_chunk(rows):
+    return list(itertools.islice(rows, STREAM_CHUNK_SIZE))
+
+
+async def stream_chunks(request, rows, encode):
+    """Pull chunks of rows on the thread pool and yield them encoded"""
+    while True:
+        chunk = await run_blocking(request, next_chunk, rows)
+        if not chunk:
+            return
+        yield encode(chunk)
+
+
+def ndjson_response(request, columns, rows):
+    def encode(chunk):
+        return ''.join(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in chunk)
+    return StreamingResponse(stream_chunks(request, iter(rows), encode), media_type='application/x-ndjson')
+
+
+def csv_response(request, columns, rows, filename):
+    def encode(chunk):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(chunk)
+        return buffer.getvalue()
+
+    async def body():
+        yield ','.join(columns) + '\r\n'
+        async for part in stream_chunks(request, iter(rows), encode):
+            yield part
+
+    return StreamingResponse(body(), media_type='text/csv',
+                             headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+async def json_body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body must be valid JSON")
+
+
+def items_of(body, key):
+    """Accept either a bare list or an object holding the list under ``key``"""
+    items = body.get(key) if isinstance(body, dict) else body
+    require(isinstance(items, list), f"Expected a list of {key}")
+    return items
+
+
+# Locked work, run on the thread pool via run_blocking
+
+def copy_project(store, name):
+    """Copy a project's top-level dict under the lock, for reading outside it"""
+    with store.lock:
+        return dict(get_project(store, name))
+
+
+def change_project(store, name, change, *args):
+    """Apply ``change(project_data, *args)`` to a project under the lock and schedule a save"""
+    with store.edit(name):
+        return change(get_project(store, name), *args)
+
+
+def add_project(store, spec):
+    with store.lock:
+        project = build_project(store, spec)
+        store.put_projects({spec['name']: project})
+    return project
+
+
+def add_projects(store, specs):
+    """Create a batch of projects, reporting an error per invalid spec instead of failing the batch"""
+    results = []
+    created = {}
+    with store.lock:
+        for spec in specs:
+            try:
+                created[spec.get('name')] = project = build_project(store, spec, created)
+                results.append({'name': spec['name'], 'id': project['id']})
+            except HTTPException as e:
+                results.append({'name': spec.get('name') if isinstance(spec, dict) else None, 'error': e.detail})
+        store.put_projects(created)
+    return results
+
+
+def remove_project(store, name):
+    with store.lock:
+        get_project(store, name)
+        store.delete_project(name)
+
+
+def sync_project_elements(store, items, mode):
+    """Apply element changes across projects, reporting an error per invalid item"""
+    changed = 0
+    errors = []
+    with store.edit() as projects:
+        for item in items:
+            try:
+                require(isinstance(item, dict), "Each item must be a JSON object")
+                changed += update_elements(get_project(store, item.get('project')), item.get('domain'),
+                                           item.get('elements'), mode)
+                projects.add(item['project'])
+            except HTTPException as e:
+                item = item if isinstance(item, dict) else {}
+                errors.append({'project': item.get('project'), 'domain': item.get('domain'), 'error': e.detail})
+    return changed, errors
+
+
+def append_connections(project_data, specs, risks, mitigations):
+    # Validate the whole batch before applying any of it
+    existing = project_data.get('canvas_connections', ())
+    added = tuple(build_connection(spec, risks, mitigations, len(existing) + i) for i, spec in enumerate(specs))
+    project_data['canvas_connections'] = (*existing, *added)
+    return len(added)
+
+
+def remove_connection(project_data, index):
+    connections = project_data.get('canvas_connections', ())
+    require(index < len(connections), f"No connection at index {index}", 404)
+    project_data['canvas_connections'] = (*connections[:index], *connections[index + 1:])
+
+
+# Projects
+
+async def list_projects(request):
+    projects, risks, mitigations = await run_blocking(request, request.app.state.store.snapshot)
+    columns = [name for name, kind in canvas.EXPORT_DATASETS['Project Overview']]
+    return ndjson_response(request, columns, canvas.iter_overview_rows(projects))
+
+
+async def create_project_endpoint(request):
+    spec = await json_body(request)
+    require(isinstance(spec, dict), "Expected a JSON object")
+    project = await run_blocking(request, add_project, request.app.state.store, spec)
+    return JSONResponse({'id': project['id']}, status_code=201)
+
+
+async def create_projects_batch(request):
+    specs = items_of(await json_body(request), 'projects')
+    results = await run_blocking(request, add_projects, request.app.state.store, specs)
+    return JSONResponse({'results': results})
+
+
+async def get_project_endpoint(request):
+    project_data = await run_blocking(request, copy_project, request.app.state.store, request.path_params['name'])
+    return JSONResponse(json.loads(json.dumps(project_data, default=str)))
+
+
+async def update_project(request):
+    body = await json_body(request)
+    require(isinstance(body, dict), "Expected a JSON object")
+    require(body.get('status', 'Open') in STATUSES, f"Invalid status: {body.get('status')}")
+    for key in ('description', 'owner'):
+        require(isinstance(body.get(key, ''), str), f"'{key}' must be a string")
+
+    fields = {key: body[key] for key in ('description', 'owner', 'status') if key in body}
+    await run_blocking(request, change_project, request.app.state.store, request.path_params['name'],
+                       dict.update, fields)
+    return JSONResponse({'updated': request.path_params['name']})
+
+
+async def delete_project(request):
+    await run_blocking(request, remove_project, request.app.state.store, request.path_params['name'])
+    return JSONResponse({'deleted': request.path_params['name']})
+
+
+# Elements, assignments and connections
+
+async def change_elements(request):
+    body = await json_body(request)
+    require(isinstance(body, dict), "Expected a JSON object")
+    mode = 'remove' if request.method == 'DELETE' else body.get('mode', 'merge')
+    require(mode in ('merge', 'replace', 'remove'), f"Invalid mode: {mode}")
+
+    changed = await run_blocking(request, change_project, request.app.state.store, request.path_params['name'],
+                                 update_elements, body.get('domain'), body.get('elements'), mode)
+    return JSONResponse({'changed': changed})
+
+
+async def sync_elements(request):
+    """Bulk merge or replace elements for many (project, domain) pairs, e.g. from a CMDB"""
+    body = await json_body(request)
+    mode = body.get('mode', 'merge') if isinstance(body, dict) else 'merge'
+    require(mode in ('merge', 'replace'), f"Invalid mode: {mode}")
+
+    changed, errors = await run_blocking(request, sync_project_elements, request.app.state.store,
+                                         items_of(body, 'items'), mode)
+    return JSONResponse({'changed': changed, 'errors': errors})
+
+
+async def set_assignments(request):
+    store = request.app.state.store
+    body = await json_body(request)
+    require(isinstance(body, dict), "Expected a JSON object")
+    domain = body.get('domain')
+    require(domain in canvas.DOMAINS, f"Invalid domain: {domain}")
+
+    updates = {}
+    for kind, library in (('risks', store.risks), ('mitigations', store.mitigations)):
+        if kind in body:
+            require(is_str_list(body[kind]), f"'{kind}' must be a list of strings")
+            unknown = [item for item in body[kind] if item not in library]
+            require(not unknown, f"Unknown {kind}: {', '.join(unknown)}")
+            updates[f'{domain}_{kind}'] = tuple(dict.fromkeys(body[kind]))
+    await run_blocking(request, change_project, store, request.path_params['name'], dict.update, updates)
+    return JSONResponse({'updated': domain})
+
+
+async def list_connections(request):
+    project_data = await run_blocking(request, copy_project, request.app.state.store, request.path_params['name'])
+    columns = [name for name, kind in canvas.EXPORT_DATASETS['Connections']]
+    return ndjson_response(request, columns, canvas.iter_connection_rows({request.path_params['name']: project_data}))
+
+
+async def add_connections(request):
+    store = request.app.state.store
+    specs = items_of(await json_body(request), 'connections')
+    added = await run_blocking(request, change_project, store, request.path_params['name'],
+                               append_connections, specs, store.risks, store.mitigations)
+    return JSONResponse({'added': added}, status_code=201)
+
+
+async def delete_connection(request):
+    index = request.path_params['index']
+    await run_blocking(request, change_project, request.app.state.store, request.path_params['name'],
+                       remove_connection, index)
+    return JSONResponse({'deleted': index})
+
+
+async def get_coverage(request):
+    store = request.app.state.store
+    project_data = await run_blocking(request, copy_project, store, request.path_params['name'])
+    return JSONResponse(await run_blocking(request, project_coverage, project_data, store.risks, store.mitigations))
+
+
+# Libraries and exports
+
+async def list_library(request):
+    store = request.app.state.store
+    get_library(store, request.path_params['library'])
+    if request.path_params['library'] == 'risks':
+        dataset, rows = 'Risk Library', canvas.iter_risk_library_rows(store.risks)
+    else:
+        dataset, rows = 'Mitigation Library', canvas.iter_mitigation_library_rows(store.mitigations)
+    return ndjson_response(request, [name for name, kind in canvas.EXPORT_DATASETS[dataset]], rows)
+
+
+async def upsert_library(request):
+    store = request.app.state.store
+    kind = request.path_params['library']
+    get_library(store, kind)
+    entries = items_of(await json_body(request), kind)
+
+    # Validate the whole batch before applying any of it
+    updated = dict(build_library_entry(kind, entry, store.risks) for entry in entries)
+
+    await run_blocking(request, store.put_library_entries, kind, updated)
+    return JSONResponse({'upserted': len(updated)})
+
+
+async def delete_library_entry(request):
+    store = request.app.state.store
+    kind = request.path_params['library']
+    entry_id = request.path_params['entry_id']
+    require(entry_id in get_library(store, kind), f"Unknown entry: {entry_id}", 404)
+    await run_blocking(request, store.delete_library_entry, kind, entry_id)
+    return JSONResponse({'deleted': entry_id})
+
+
+async def export_dataset(request):
+    store = request.app.state.store
+    datasets = {name.lower().replace(' ', '-'): name for name in canvas.EXPORT_DATASETS}
+    slug = request.path_params['dataset']
+    require(slug in datasets, f"Unknown dataset: {slug}. Choose from {', '.join(datasets)}", 404)
+    export_format = request.query_params.get('format', 'csv')
+    require(export_format in ('csv', 'ndjson'), f"Invalid format: {export_format}")
+
+    dataset = datasets[slug]
+    columns = [name for name, kind in canvas.EXPORT_DATASETS[dataset]]
+    rows = canvas.iter_export_rows(dataset, *await run_blocking(request, store.snapshot))
+    if export_format == 'ndjson':
+        return ndjson_response(request, columns, rows)
+    return csv_response(request, columns, rows, f"{slug}.csv")
+
+
+async def http_error(request, exc):
+    return JSONResponse({'error': exc.detail}, status_code=exc.status_code)
+
+
+def create_app(store, workers=API_WORKERS):
+    """Build the ASGI application around a store"""
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        # Persist changes still waiting out the store's save delay before shutting down
+        store.flush()
+        app.state.pool.shutdown(wait=False)
+
+    routes = [
+        Route('/api/projects', list_projects, methods=['GET']),
+        Route('/api/projects', create_project_endpoint, methods=['POST']),
+        Route('/api/projects/batch', create_projects_batch, methods=['POST']),
+        Route('/api/projects/{name}', get_project_endpoint, methods=['GET']),
+        Route('/api/projects/{name}', update_project, methods=['PATCH']),
+        Route('/api/projects/{name}', delete_project, methods=['DELETE']),
+        Route('/api/projects/{name}/elements', change_elements, methods=['POST', 'DELETE']),
+        Route('/api/projects/{name}/assignments', set_assignments, methods=['PUT']),
+        Route('/api/projects/{name}/connections', list_connections, methods=['GET']),
+        Route('/api/projects/{name}/connections', add_connections, methods=['POST']),
+        Route('/api/projects/{name}/connections/{index:int}', delete_connection, methods=['DELETE']),
+        Route('/api/projects/{name}/coverage', get_coverage, methods=['GET']),
+        Route('/api/sync/elements', sync_elements, methods=['POST']),
+        Route('/api/export/{dataset}', export_dataset, methods=['GET']),
+        Route('/api/{library:str}', list_library, methods=['GET']),
+        Route('/api/{library:str}', upsert_library, methods=['POST']),
+        Route('/api/{library:str}/{entry_id}', delete_library_entry, methods=['DELETE'])
+    ]
+    app = Starlette(routes=routes, exception_handlers={HTTPException: http_error}, lifespan=lifespan)
+    app.state.store = store
+    app.state.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='canvas-api')
+    return app
+
+
+def start_api_server(store, host="127.0.0.1", port=8600, workers=API_WORKERS):
+    """Serve the API on a background thread, e.g. inside the Streamlit process"""
+    server = uvicorn.Server(uvicorn.Config(create_app(store, workers), host=host, port=port, log_level="warning"))
+    threading.Thread(target=server.run, name='canvas-api-server', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless HTTP API for the Security Architecture Canvas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--data", help="JSON file to load the store from and persist it to")
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="Threads for heavy reads and streaming")
+    args = parser.parse_args()
+
+    store = canvas.CanvasStore(args.data)
+    uvicorn.run(create_app(store, args.workers), host=args.host, port=args.port)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""Concurrent-session soak test for the Security Architecture Canvas.
+
+Starts the app with ``streamlit run`` and drives N sessions against that one
+server process over Streamlit's websocket protocol, the way N browser tabs
+would. Their reruns share the server's script threads, its GIL and the shared
+canvas store's lock, so contention shows up in the numbers. Each session:
+
+1. opens the Project Canvas and creates a project,
+2. adds elements to a few domains,
+3. adds connections between domains,
+4. opens the dashboard.
+
+Every session count gets a fresh server with an in-memory store. A throwaway
+session first visits the same pages without creating anything, so imports and
+caches are loaded before the baseline is taken. For each session count the
+harness reports:
+
+- ``latency_*_ms``: client-side rerun latency, from sending a rerun request to
+  the server reporting the (last) script run finished, across all sessions,
+- ``server_rss_*_mb``: resident memory of the server process after warm-up
+  (baseline) and with all sessions finished but still connected, the growth
+  between them and that growth divided by the session count. Code that only
+  runs once a project exists is loaded during the run, so the first session
+  count's growth includes it.
+
+``session_state_kb`` is measured once, in this process, by running one session
+of the same flow with ``streamlit.testing.v1.AppTest``. It excludes the keys
+that alias the shared store (``STORE_KEYS``), so it is the state each
+additional session adds on its own. Results are written as JSON so a CI job
+can archive and track them over time.
+
+Usage:
+    python soak_test.py --sessions 1 5 10 20 --output soak_results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from contextlib import AsyncExitStack, contextmanager
+from datetime import datetime
+
+import numpy as np
+import websockets
+from streamlit.proto.Alert_pb2 import Alert
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Archystry.py")
+DEFAULT_SESSION_COUNTS = [1, 5, 10, 20]
+ELEMENT_DOMAINS = ["Services", "Applications", "Data"]
+CONNECTION_TARGETS = ["Services", "Applications", "Network"]
+WIDGET_KINDS = ("selectbox", "text_input", "button", "checkbox")
+# Session state keys that alias the process-wide CanvasStore rather than holding per-session data
+STORE_KEYS = {'projects', 'risks', 'mitigations', 'project_templates'}
+# Settings that would persist the store or start the HTTP API inside the measured server
+STORE_ENV = ("ARCHYSTRY_DATA", "ARCHYSTRY_API_PORT")
+
+
+def process_rss_mb(pid):
+    """Current resident set size of process ``pid`` in MB"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ps reports RSS in KB on both Linux and macOS
+    return int(subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True,
+                              check=True).stdout) / 1024
+
+
+def deep_size(obj, seen=None):
+    """Approximate the memory held by an object graph in bytes"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    return size
+
+
+def session_state_bytes(at):
+    """Approximate size of the data one session holds on its own, leaving out the shared store's keys"""
+    return sum(deep_size(at.session_state[key]) for key in at.session_state if key not in STORE_KEYS)
+
+
+def shown_option(options, value):
+    """Return ``value`` as it appears among a selectbox's displayed options; the page selector drops the icon"""
+    for shown in (value, value.split(' ', 1)[-1]):
+        if shown in options:
+            return shown
+    raise LookupError(f"No option {value!r}")
+
+
+def find_widget(widgets, label):
+    """Return the first widget whose label starts with ``label``"""
+    for widget in widgets:
+        if widget.label.startswith(label):
+            return widget
+    raise LookupError(f"No widget labelled {label!r}")
+
+
+def session_flow(session_index, elements_per_domain, connections):
+    """Yield the scripted steps of one session as (name, [(widget kind, label, value), ...]) before each rerun"""
+    project_name = f"Soak Project {session_index}"
+
+    yield "open canvas", [('selectbox', "Select Page:", "📁 Project Canvas")]
+    yield "create project", [('text_input', "Project Name", project_name),
+                             ('text_input', "Project Owner", f"analyst-{session_index}"),
+                             ('button', "🚀 Create Project", None)]
+
+    for domain in ELEMENT_DOMAINS:
+        yield "select domain", [('selectbox', "Select Domain to Manage", domain)]
+        for n in range(elements_per_domain):
+            yield "add element", [('text_input', f"Add element to {domain}", f"{domain} element {n}"),
+                                  ('button', "Add Element", None)]
+
+    yield "connection mode", [('checkbox', "🔗 Connection Mode", True)]
+    for n in range(connections):
+        yield "add connection", [('selectbox', "From Domain", "People"),
+                                 ('selectbox', "To Domain", CONNECTION_TARGETS[n % len(CONNECTION_TARGETS)]),
+                                 ('button', "➕ Add Connection", None)]
+
+    yield "open dashboard", [('selectbox', "Select Page:", "🏠 Dashboard")]
+
+
+def warm_up_flow():
+    """Visit the pages the sessions use without creating any data"""
+    yield "open canvas", [('selectbox', "Select Page:", "📁 Project Canvas")]
+    yield "open dashboard", [('selectbox', "Select Page:", "🏠 Dashboard")]
+
+
+class ServerSession:
+    """One browser session against a running server, speaking Streamlit's websocket protocol"""
+
+    def __init__(self, websocket, timeout):
+        self.websocket = websocket
+        self.timeout = timeout
+        self.widgets = []  # (kind, proto) of every widget rendered by the last script run
+        self.values = {}   # Widget id -> WidgetState the browser sends back with every rerun
+        self.errors = 0
+
+    def widget_state(self, kind, label, value):
+        widget = find_widget((proto for widget_kind, proto in self.widgets if widget_kind == kind), label)
+        state = WidgetState(id=widget.id)
+        if kind == 'selectbox':
+            state.string_value = shown_option(widget.options, value)  # Browsers send the option as displayed
+        elif kind == 'text_input':
+            state.string_value = value
+        elif kind == 'checkbox':
+            state.bool_value = value
+        else:
+            state.trigger_value = True
+        return state
+
+    async def rerun(self, actions=()):
+        """Apply ``actions`` to the rendered widgets, rerun the script and return the latency in seconds"""
+        triggers = []
+        for kind, label, value in actions:
+            state = self.widget_state(kind, label, value)
+            if kind == 'button':
+                triggers.append(state)  # Triggers are sent once, not kept
+            else:
+                self.values[state.id] = state
+        message = BackMsg()
+        message.rerun_script.widget_states.widgets.extend([*self.values.values(), *triggers])
+
+        start = time.perf_counter()
+        await self.websocket.send(message.SerializeToString())
+        widgets, errors = [], 0
+        while True:
+            reply = ForwardMsg()
+            reply.ParseFromString(await asyncio.wait_for(self.websocket.recv(), self.timeout))
+            kind = reply.WhichOneof('type')
+            if kind == 'new_session':
+                # A script run started; st.rerun() starts another before the first finishes
+                widgets, errors = [], 0
+            elif kind == 'delta' and reply.delta.WhichOneof('type') == 'new_element':
+                element = reply.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type in WIDGET_KINDS:
+                    widgets.append((element_type, getattr(element, element_type)))
+                elif element_type == 'exception' or (element_type == 'alert' and element.alert.format == Alert.ERROR):
+                    errors += 1
+            elif kind == 'script_finished' and reply.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                errors += reply.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR
+                break
+        latency = time.perf_counter() - start
+
+        self.widgets = widgets
+        self.errors += errors
+        return latency
+
+    async def run_flow(self, flow):
+        """Load the page, then rerun once per step of ``flow``; returns every rerun latency"""
+        latencies = [await self.rerun()]
+        for name, actions in flow:
+            latencies.append(await self.rerun(actions))
+        return latencies
+
+
+async def drive_sessions(url, flows, timeout, measure=None):
+    """Run one connected session per flow concurrently; ``measure`` runs before they disconnect"""
+    async with AsyncExitStack() as stack:
+        sessions = [ServerSession(await stack.enter_async_context(
+                        websockets.connect(url, subprotocols=["streamlit"], max_size=None)), timeout)
+                    for flow in flows]
+        latencies = await asyncio.gather(*(session.run_flow(flow) for session, flow in zip(sessions, flows)))
+        measured = measure() if measure else None
+    return [latency for session in latencies for latency in session], \
+        sum(session.errors for session in sessions), measured
+
+
+@contextmanager
+def streamlit_server(timeout):
+    """Run the app under ``streamlit run`` on a free local port; yields the process and its websocket URL"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = subprocess.Popen([sys.executable, "-m", "streamlit", "run", APP_PATH,
+                               "--server.headless=true", "--server.address=127.0.0.1", f"--server.port={port}",
+                               "--server.fileWatcherType=none", "--browser.gatherUsageStats=false",
+                               "--logger.level=error"],
+                              stdout=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"streamlit exited with status {server.returncode}")
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"streamlit did not start within {timeout}s")
+                time.sleep(0.2)
+        yield server, f"ws://127.0.0.1:{port}/_stcore/stream"
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+
+def run_soak(session_count, elements_per_domain, connections, timeout):
+    """Run ``session_count`` concurrent sessions against a fresh server and summarise latency and server memory"""
+    with streamlit_server(timeout) as (server, url):
+        asyncio.run(drive_sessions(url, [warm_up_flow()], timeout))
+        baseline_rss = process_rss_mb(server.pid)
+        flows = [session_flow(i, elements_per_domain, connections) for i in range(session_count)]
+        latencies, errors, server_rss = asyncio.run(
+            drive_sessions(url, flows, timeout, measure=lambda: process_rss_mb(server.pid)))
+
+    latency_ms = np.array(latencies) * 1000
+    growth = server_rss - baseline_rss
+
+    return {
+        'sessions': session_count,
+        'reruns': len(latency_ms),
+        'errors': errors,
+        'latency_p50_ms': round(float(np.percentile(latency_ms, 50)), 2),
+        'latency_p95_ms': round(float(np.percentile(latency_ms, 95)), 2),
+        'latency_p99_ms': round(float(np.percentile(latency_ms, 99)), 2),
+        'latency_max_ms': round(float(latency_ms.max()), 2),
+        'server_rss_baseline_mb': round(baseline_rss, 1),
+        'server_rss_mb': round(server_rss, 1),
+        'server_rss_growth_mb': round(growth, 1),
+        'server_rss_growth_per_session_mb': round(growth / session_count, 2)
+    }
+
+
+def measure_session_state(elements_per_domain, connections, timeout):
+    """Run one session of the flow in this process and return its own session state in KB"""
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.run()
+    for name, actions in session_flow(0, elements_per_domain, connections):
+        for kind, label, value in actions:
+            widget = find_widget(getattr(at, kind), label)
+            if kind == 'button':
+                widget.click()
+            else:
+                widget.set_value(value)
+        at.run()
+    return round(session_state_bytes(at) / 1024, 1)
+
+
+def git_revision():
+    """Return the current git commit, if available"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(APP_PATH), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session soak test for the Security Architecture Canvas")
+    parser.add_argument("--sessions", type=int, nargs="+", default=DEFAULT_SESSION_COUNTS,
+                        help="Session counts to run, in order (default: %(default)s)")
+    parser.add_argument("--elements", type=int, default=5, help="Elements added per domain by each session")
+    parser.add_argument("--connections", type=int, default=3, help="Connections added by each session")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-rerun and server start timeout in seconds")
+    parser.add_argument("--output", default="soak_results.json", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    # Servers (and the in-process session) start from an empty in-memory store with no HTTP API
+    for key in STORE_ENV:
+        os.environ.pop(key, None)
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'elements_per_domain': args.elements,
+        'connections_per_session': args.connections,
+        'session_state_kb': measure_session_state(args.elements, args.connections, args.timeout),
+        'runs': []
+    }
+    print(f"Per-session state (excluding shared store keys): {results['session_state_kb']} KB")
+
+    print(f"{'sessions':>8} {'reruns':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'server MB':>9} {'growth MB':>9} {'MB/sess':>8} {'errors':>6}")
+    for count in args.sessions:
+        run = run_soak(count, args.elements, args.connections, args.timeout)
+        results['runs'].append(run)
+        print(f"{run['sessions']:>8} {run['reruns']:>7} {run['latency_p50_ms']:>8} {run['latency_p95_ms']:>8} "
+              f"{run['latency_p99_ms']:>8} {run['server_rss_mb']:>9} {run['server_rss_growth_mb']:>9} "
+              f"{run['server_rss_growth_per_session_mb']:>8} {run['errors']:>6}")
+
+    with open(args.output, "w") as out:
+        json.dump(results, out, indent=2)
+    print(f"Results written to {args.output}")
+
+    return 1 if any(run['errors'] for run in results['runs']) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())